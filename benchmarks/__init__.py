@@ -0,0 +1 @@
+"""Benchmarks of the pycee pipeline, run offline against recorded API responses."""
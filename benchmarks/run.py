@@ -0,0 +1,331 @@
+"""This module benchmarks pycee on a script for each error type it handles.
+Every script is diagnosed with an empty cache (cold) and then again with the cache
+filled by the first run (warm), timing the whole run and each stage of the pipeline.
+Batch throughput is measured diagnosing all scripts at once.
+
+Responses of the StackExchange API and of Google are played back from
+fixtures/api.json, so benchmarks run offline. The shipped fixtures are synthetic,
+with different questions and answers for the query of each script. Run with --record
+to record them from the live services instead.
+
+Timings depend on the machine, so regressions against a baseline recorded on another
+platform or Python version are only reported, without failing.
+
+Usage:
+    python -m benchmarks.run --output results.json --baseline
+"""
+import argparse
+import importlib
+import io
+import json
+import os
+import pathlib
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager, redirect_stdout
+from functools import wraps
+
+import googlesearch
+import requests
+from httmock import all_requests, HTTMock
+
+from pycee import cache, pipeline, scheduler, session, source
+from pycee.batch import run_batch
+from pycee.scheduler import api_method
+from pycee.utils import parse_args, parse_batch_args
+
+BENCHMARKS_DIR = pathlib.Path(__file__).parent
+SCRIPTS_DIR = BENCHMARKS_DIR / "scripts"
+FIXTURES_FILE = BENCHMARKS_DIR / "fixtures" / "api.json"
+BASELINE_FILE = BENCHMARKS_DIR / "baseline.json"
+RESULTS_VERSION = 1
+
+# functions timed as stages of the pipeline, as (stage, module, function)
+STAGES = [
+    ("inspect", "pycee.pipeline", "get_error_info"),
+    ("handle", "pycee.pipeline", "handle_error"),
+    ("search", "pycee.answers", "_cached_ask_stackoverflow"),
+    ("search", "pycee.answers", "_cached_ask_google"),
+    ("answers", "pycee.answers", "_cached_answer_content"),
+    ("rank", "pycee.answers", "rank_answers"),
+    ("markdown", "pycee.answers", "to_markdown"),
+    ("summarize", "pycee.answers", "summarize_many"),
+    ("render", "pycee.rendering", "to_ansi"),
+]
+# slowdowns smaller than this (in seconds) are noise, not regressions
+MIN_REGRESSION = 0.005
+
+
+def main(argv=sys.argv[1:]):
+
+    parser = argparse.ArgumentParser("python -m benchmarks.run", description="Benchmark the pycee pipeline offline.")
+    parser.add_argument("--repeat", type=int, default=7, help="Runs of each script, the median is reported")
+    parser.add_argument("--output", default="-", help="Path of the json results, by default the standard output")
+    parser.add_argument(
+        "--baseline",
+        nargs="?",
+        const=str(BASELINE_FILE),
+        help="Compare results with a previous output, failing on regressions. Defaults to the stored baseline",
+    )
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Slowdown allowed against the baseline")
+    parser.add_argument("-j", metavar="--jobs", type=int, default=4, dest="jobs", help="Jobs of the batch benchmark")
+    parser.add_argument("--record", action="store_true", help="Record the fixtures from the live services")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        record()
+        return
+
+    results = run_benchmarks(args.repeat, args.jobs)
+    output = json.dumps(results, indent=2)
+
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.tolerance)
+        advisory = not same_machine(results, baseline)
+        if advisory:
+            print(
+                f"The baseline comes from another machine ({baseline.get('platform')}, Python {baseline.get('python')}),"
+                " regressions are only reported. Record a baseline on this machine to check them.",
+                file=sys.stderr,
+            )
+        for metric, current, baseline_seconds in regressions:
+            print(
+                f"Regression on {metric}: {current * 1000:.1f}ms, baseline {baseline_seconds * 1000:.1f}ms",
+                file=sys.stderr,
+            )
+        if regressions and not advisory:
+            sys.exit(1)
+
+
+def run_benchmarks(repeat: int, jobs: int) -> dict:
+    """Benchmark every script, cold and warm, and the batch throughput."""
+
+    results = {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created_at": time.time(),
+        "scripts": {},
+    }
+
+    with playback(load_fixtures()):
+        for script in sorted(SCRIPTS_DIR.glob("*.py")):
+            runs = defaultdict(list)
+            for _ in range(repeat):
+                with fresh_cache():
+                    runs["cold"].append(time_run(script))
+                    runs["warm"].append(time_run(script))
+            results["scripts"][script.stem] = {kind: _median_run(kind_runs) for kind, kind_runs in runs.items()}
+
+        with fresh_cache():
+            results["batch"] = time_batch(jobs)
+
+    return results
+
+
+def time_run(script: pathlib.Path) -> dict:
+    """Run pycee on a script as the command line does, timing each stage."""
+
+    stages = defaultdict(float)
+    args = parse_args([str(script)])
+
+    with redirect_stdout(io.StringIO()), timed_stages(stages):
+        start = time.perf_counter()
+        try:
+            pipeline.run(args)
+        except SystemExit:
+            pass
+        total = time.perf_counter() - start
+
+    return {"total": total, "stages": dict(stages)}
+
+
+def time_batch(jobs: int) -> dict:
+    """Diagnose all scripts in a single batch run."""
+
+    args = parse_batch_args([str(SCRIPTS_DIR), "--output", os.devnull, "-j", str(jobs)])
+
+    start = time.perf_counter()
+    counts = run_batch(args.source, args.output, args)
+    seconds = time.perf_counter() - start
+
+    return {
+        "jobs": jobs,
+        "scripts": counts["scripts"],
+        "total": seconds,
+        "scripts_per_second": counts["scripts"] / seconds,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Find the timings slower than the baseline by more than tolerance.
+    output: a list of (metric, current, baseline) tuples
+    """
+
+    current, previous = _timings(results), _timings(baseline)
+    regressions = []
+
+    for metric, seconds in sorted(current.items()):
+        if metric not in previous:
+            continue
+        if seconds > previous[metric] * (1 + tolerance) and seconds - previous[metric] > MIN_REGRESSION:
+            regressions.append((metric, seconds, previous[metric]))
+
+    return regressions
+
+
+def same_machine(results: dict, baseline: dict) -> bool:
+    """Whether results and baseline were measured on the same platform and Python version."""
+
+    return all(results.get(field) == baseline.get(field) for field in ("python", "platform"))
+
+
+@contextmanager
+def timed_stages(stages: dict):
+    """Add the time spent on each stage function to stages while in the context."""
+
+    originals = []
+
+    for stage, module_name, name in STAGES:
+        module = importlib.import_module(module_name)
+        function = getattr(module, name)
+        originals.append((module, name, function))
+        setattr(module, name, _timed(function, stage, stages))
+
+    try:
+        yield stages
+    finally:
+        for module, name, function in originals:
+            setattr(module, name, function)
+
+
+@contextmanager
+def fresh_cache():
+    """Run with an empty cache and no line indexes in memory."""
+
+    previous = os.environ.get("XDG_CACHE_HOME")
+
+    with tempfile.TemporaryDirectory() as cache_home:
+        os.environ["XDG_CACHE_HOME"] = cache_home
+        cache._cache = None
+        source._indexes.clear()
+        try:
+            yield
+        finally:
+            if cache._cache is not None:
+                cache._cache.close()
+            cache._cache = None
+            if previous is None:
+                del os.environ["XDG_CACHE_HOME"]
+            else:
+                os.environ["XDG_CACHE_HOME"] = previous
+
+
+@contextmanager
+def playback(fixtures: dict):
+    """Answer requests to the StackExchange API and Google searches with the fixtures.
+    Requests missing from the fixtures get the default response of their API method.
+    The scheduler doesn't throttle requests, as no request reaches the API."""
+
+    @all_requests
+    def api(url, request):
+        content = fixtures["stackexchange"].get(request.url) or fixtures["defaults"][api_method(request.url)]
+        return {"status_code": 200, "content": content}
+
+    search, limits = googlesearch.search, (scheduler.REQUESTS_PER_SECOND, scheduler.BURST)
+    googlesearch.search = lambda query, **kwargs: fixtures["google"].get(query) or fixtures["defaults"]["google"]
+    scheduler.REQUESTS_PER_SECOND = scheduler.BURST = 10 ** 6
+
+    try:
+        with HTTMock(api):
+            yield
+    finally:
+        googlesearch.search = search
+        scheduler.REQUESTS_PER_SECOND, scheduler.BURST = limits
+
+
+def record():
+    """Run every script against the live services and save their responses as the fixtures."""
+
+    fixtures = load_fixtures()
+    fixtures["stackexchange"], fixtures["google"] = {}, {}
+    get, search = session.get, googlesearch.search
+
+    def recording_get(url, **kwargs):
+        response = get(url, **kwargs)
+        fixtures["stackexchange"][requests.Request("GET", url).prepare().url] = response.json()
+        return response
+
+    def recording_search(query, **kwargs):
+        fixtures["google"][query] = search(query, **kwargs)
+        return fixtures["google"][query]
+
+    session.get, googlesearch.search = recording_get, recording_search
+    try:
+        for script in sorted(SCRIPTS_DIR.glob("*.py")):
+            with fresh_cache():
+                time_run(script)
+    finally:
+        session.get, googlesearch.search = get, search
+
+    with open(FIXTURES_FILE, "w") as file:
+        json.dump(fixtures, file, indent=1)
+    print(f"Recorded {len(fixtures['stackexchange'])} API responses and {len(fixtures['google'])} searches")
+
+
+def load_fixtures() -> dict:
+
+    with open(FIXTURES_FILE, "r") as file:
+        return json.load(file)
+
+
+def _timed(function, stage: str, stages: dict):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stages[stage] += time.perf_counter() - start
+
+    return wrapper
+
+
+def _median_run(runs: list) -> dict:
+
+    stages = {stage for run in runs for stage in run["stages"]}
+    return {
+        "total": statistics.median(run["total"] for run in runs),
+        "stages": {stage: statistics.median(run["stages"].get(stage, 0) for run in runs) for stage in sorted(stages)},
+    }
+
+
+def _timings(results: dict) -> dict:
+    """Flatten the timings of results, like {"index_error.cold.stages.rank": 0.001}."""
+
+    timings = {}
+    for script, runs in results.get("scripts", {}).items():
+        for kind, run in runs.items():
+            timings[f"{script}.{kind}.total"] = run["total"]
+            for stage, seconds in run["stages"].items():
+                timings[f"{script}.{kind}.stages.{stage}"] = seconds
+    if "batch" in results:
+        timings["batch.total"] = results["batch"]["total"]
+
+    return timings
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+students = []
+best = students[0]
@@ -0,0 +1,2 @@
+ages = {"ana": 21, "bruno": 19}
+print(ages["carla"])
@@ -0,0 +1,3 @@
+import numpyy
+
+print(numpyy.zeros(3))
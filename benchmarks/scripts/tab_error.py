@@ -0,0 +1,3 @@
+def average(grades):
+	total = sum(grades)
+        return total / len(grades)
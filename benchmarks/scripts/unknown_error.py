@@ -0,0 +1 @@
+age = int("twenty")
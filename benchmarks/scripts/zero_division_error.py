@@ -0,0 +1,2 @@
+grades = []
+average = sum(grades) / len(grades)
@@ -2,55 +2,145 @@
  retrieving the adequate questions for the compiler error
  and then choosing the best answer for the error"""
 
+import math
 import re
-from typing import Tuple
-from operator import attrgetter
+import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, Tuple
 
 from argparse import Namespace
-from filecache import filecache, MONTH
-import googlesearch
-from html2text import html2text
-import requests
 
-from .utils import ANSWERS_URL
+from . import index
+from .cache import cached, MONTH
+from .profiling import span
+from .ranking import rank_answers
+from .rendering import to_markdown
+from .summarizer import summarize, summarize_many
+from .scheduler import api_get, ApiError, ApiUnavailable
+from .utils import ANSWERS_URL, MAX_IDS_PER_REQUEST, MAX_PAGESIZE
 from .utils import Question, Answer
 
 
-def get_answers(query, error_info: dict, cmd_args: Namespace):
+def get_answers(query, error_info: dict, cmd_args: Namespace, strict: bool = False):
     """This coordinate the answer aquisition process. It goes like this:
     1- Use the query to check stackexchange API for related questions
     2- If stackoverflow API search engine couldn't find questions, ask Google instead
     3- For each question, get the most voted and accepted answers
-    4- Sort answers by vote count and limit them
-    3- TODO: Summarize long answers and make it ready to output to the user;
+    4- Rank answers by their votes and how they match the code of the user, and limit them
+    5- Summarize long answers and make them ready to output to the user
+    When the API can't be used, the user is told and no answers are given,
+    unless strict is set, which raises ApiUnavailable for the caller to handle.
     """
 
     questions = answers = None
 
-    # TODO: @marcelofa, implement a decent optional cache feature
-    if cmd_args.cache:
-        questions, answers = ask_cache(query, error_info, cmd_args)
-    else:
-        questions, answers = ask_live(query, error_info, cmd_args)
+    try:
+        if cmd_args.offline:
+            questions, answers = ask_index(query, error_info, cmd_args)
+        elif cmd_args.cache:
+            questions, answers = ask_cache(query, error_info, cmd_args)
+        else:
+            questions, answers = ask_live(query, error_info, cmd_args)
+    except ApiUnavailable as error:
+        if strict:
+            raise
+        _print_unavailable(error, cmd_args)
+        questions = answers = tuple()
+
+    with span("rank", candidates=len(answers)):
+        sorted_answers = rank_answers(answers, error_info)[: cmd_args.n_answers]
 
-    sorted_answers = sorted(answers, key=attrgetter("score"), reverse=True)[: cmd_args.n_answers]
-    summarized_answers = []
+    summarized_answers = [to_markdown(ans) for ans in sorted_answers]
 
-    for ans in sorted_answers:
-        markdown_body = html2text(ans.body)
-        # TODO: summarize long answers
-        summarized_answers.append(markdown_body)
+    if cmd_args.summarize:
+        with span("summarize"):
+            summarized_answers = summarize_many(summarized_answers, error_info)
 
     return summarized_answers, sorted_answers
 
 
+def iter_answers(query, error_info: dict, cmd_args: Namespace) -> Iterator[Tuple[str, Answer]]:
+    """Like get_answers, but yields (markdown, answer) pairs as soon as they arrive,
+    instead of waiting for the answers of all questions. Answers of each question
+    are requested separately and concurrently, so the first ones come after a single request.
+    Answers come in arrival order, not sorted by votes. Answers already cached,
+    by a regular run for instance, come at once and ranked instead."""
+
+    def markdown_for(ans):
+        markdown = to_markdown(ans)
+        return summarize(markdown, error_info) if cmd_args.summarize else markdown
+
+    if cmd_args.offline:
+        _, answers = ask_index(query, error_info, cmd_args)
+        for ans in rank_answers(answers, error_info):
+            yield markdown_for(ans), ans
+        return
+
+    if cmd_args.cache:
+        ask_stackoverflow, ask_google = _cached_ask_stackoverflow, _cached_ask_google
+    else:
+        ask_stackoverflow, ask_google = _ask_stackoverflow, _ask_google
+
+    try:
+        if cmd_args.google_search_only:
+            questions = ask_google(error_info["message"], cmd_args.n_questions)
+        else:
+            # force a google search if stackoverflow didn't provide any answer
+            questions = ask_stackoverflow(query) or ask_google(error_info["message"], cmd_args.n_questions)
+        # answers are cached under the same key as ask_cache uses, for all questions at once
+        cached_answers = _cached_answer_content.peek(questions) if cmd_args.cache else None
+    except ApiUnavailable as error:
+        _print_unavailable(error, cmd_args)
+        return
+
+    if cached_answers is not None:
+        for ans in rank_answers(cached_answers, error_info):
+            yield markdown_for(ans), ans
+        return
+
+    executor = ThreadPoolExecutor(max_workers=cmd_args.workers)
+    futures = [executor.submit(_get_answer_content, (question,)) for question in questions]
+    answers_of = {}
+
+    try:
+        for future in as_completed(futures):
+            try:
+                answers_of[future] = future.result()
+            except ApiUnavailable:
+                # answers of this question are missing, others may still arrive
+                continue
+            for ans in answers_of[future]:
+                yield markdown_for(ans), ans
+    finally:
+        # the consumer may stop early, requests not started yet are dropped
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+    if cmd_args.cache and len(answers_of) == len(futures):
+        # answers of every question arrived, in question order they are what ask_cache would cache
+        _cached_answer_content.store(tuple(ans for future in futures for ans in answers_of[future]), questions)
+
+
+def _print_unavailable(error: ApiUnavailable, cmd_args: Namespace):
+    """Tell the user why answers are missing, on stderr so outputs like the results of a batch stay clean."""
+
+    if cmd_args.cache:
+        message = f"Stackoverflow can't be reached now ({error}) and no answers are cached for this error."
+    else:
+        message = f"Stackoverflow can't be reached now ({error}), try again later or without --no-cache."
+    print(message + "\n", file=sys.stderr)
+
+
 def _ask_stackoverflow(query: str) -> Tuple[Question, None]:
     """Ask StackOverflow (so) API for questions."""
 
     if query is None:
         return tuple()
 
-    response_json = requests.get(query).json()
+    with span("search.stackoverflow"):
+        response_json = api_get(query)
     questions = []
 
     for question in response_json["items"]:
@@ -65,11 +155,15 @@ def _ask_google(error_message: str, n_questions: int) -> Tuple[Question, None]:
     """Google errors that could not be found
     using StackOverflow API"""
 
+    # googlesearch pulls in a html parser, so it is imported only when google is asked
+    import googlesearch
+
     # restrict to get only results form StackOverflow
     query = error_message + " site:stackoverflow.com"
-    questions_url = googlesearch.search(
-        query,
-    )[:n_questions]
+    with span("search.google"):
+        questions_url = googlesearch.search(
+            query,
+        )[:n_questions]
 
     # parse questions id from each url path
     # re.findall will return something like '/666/' so the
@@ -79,33 +173,33 @@ def _ask_google(error_message: str, n_questions: int) -> Tuple[Question, None]:
     return tuple(Question(id=qid, has_accepted=None) for qid in questions_id)
 
 
-def _get_answer_content(questions: Tuple[Question]) -> Tuple[Answer, None]:
-    """Retrieve the most voted and the accepted answers for each question"""
+def _get_answer_content(questions: Tuple[Question], workers: int = 1) -> Tuple[Answer, None]:
+    """Retrieve the most voted and the accepted answers for each question.
+    Answers for all questions are fetched at once, as the StackExchange API
+    accepts a semicolon separated list of question ids. With more than one
+    worker, questions are split among concurrent requests instead."""
+
+    with span("answers.fetch", questions=len(questions)):
+        return _pick_answers(questions, _fetch_answers(questions, workers))
+
+
+def _pick_answers(questions: Tuple[Question], items_by_question: dict) -> Tuple[Answer, None]:
+    """Pick the most voted and the accepted answers of each question
+    from answer items sorted by score"""
 
     answers = []
 
     for question in questions:
 
-        response = requests.get(ANSWERS_URL.replace("<id>", question.id))
-        items = response.json()["items"]
+        items = items_by_question.get(question.id, [])
 
         if items == []:
             continue
-        
+
         # get most voted answer
         # first item because results are retrieved sorted by score
         most_voted = items[0]
-        
-        answers.append(
-            Answer(
-                id=str(most_voted["answer_id"]),
-                accepted=most_voted["is_accepted"],
-                score=most_voted["score"],
-                body=most_voted["body"],
-                author=most_voted["owner"]["display_name"],
-                profile_image=most_voted["owner"].get("profile_image", None),
-            )
-        )
+        answers.append(_answer_from_item(most_voted))
 
         # oftentimes the most voted answer
         # is also the accepted asnwer
@@ -119,21 +213,80 @@ def _get_answer_content(questions: Tuple[Question]) -> Tuple[Answer, None]:
         if filtered == []:
             continue
 
-        accepted = filtered[0]
-        answers.append(
-            Answer(
-                id=str(accepted["answer_id"]),
-                accepted=True,
-                score=accepted["score"],
-                body=accepted["body"],
-                author=accepted["owner"]["display_name"],
-                profile_image=accepted["owner"].get("profile_image", None),
-            )
-        )
+        answers.append(_answer_from_item(filtered[0]))
 
     return tuple(answers)
 
 
+def _fetch_answers(questions: Tuple[Question], workers: int = 1) -> dict:
+    """Fetch answers of many questions with as few requests as possible.
+    Question ids are split in up to `workers` chunks (of at most 100 ids, the API limit)
+    which are requested concurrently, so the wall time is bound by the slowest request.
+    output: a dict mapping each question id to its answers, sorted by score
+    """
+
+    ids = [question.id for question in questions]
+    if not ids:
+        return {}
+
+    chunk_size = min(MAX_IDS_PER_REQUEST, math.ceil(len(ids) / workers))
+    chunks = [ids[i : i + chunk_size] for i in range(0, len(ids), chunk_size)]
+    items_by_question = defaultdict(list)
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+        for items in executor.map(_fetch_answers_chunk, chunks):
+            # items are sorted by score across all questions of a chunk,
+            # so the order is kept when they are grouped by question
+            for item in items:
+                items_by_question[str(item["question_id"])].append(item)
+
+    return items_by_question
+
+
+def _fetch_answers_chunk(ids: list) -> list:
+    """Fetch answers of a chunk of question ids, one request per page
+    while the API says it has more."""
+
+    url = ANSWERS_URL.replace("<id>", ";".join(ids))
+    items = []
+    page, has_more = 1, True
+
+    while has_more:
+        response_json = api_get(url + f"&pagesize={MAX_PAGESIZE}&page={page}")
+        items.extend(response_json["items"])
+        has_more = response_json.get("has_more", False)
+        page += 1
+
+    return items
+
+
+def _answer_from_item(item: dict) -> Answer:
+    """Build an Answer from an answer item of the API response"""
+
+    return Answer(
+        id=str(item["answer_id"]),
+        accepted=item["is_accepted"],
+        score=item["score"],
+        body=item["body"],
+        author=item["owner"]["display_name"],
+        profile_image=item["owner"].get("profile_image", None),
+        last_edit=item.get("last_edit_date", item.get("creation_date")),
+    )
+
+
+def ask_index(query, error_info, cmd_args):
+    """ Retrieve questions and answers from the offline index, without any http request """
+
+    try:
+        questions = index.search(query)
+    except FileNotFoundError as error:
+        print(error)
+        sys.exit(-1)
+
+    answers = _pick_answers(questions, index.answer_items([q.id for q in questions]))
+    return questions, answers
+
+
 # Cache related code below
 
 
@@ -147,7 +300,7 @@ def ask_cache(query, error_info, cmd_args):
         # force a google search if stackoverflow didn't provide any answer
         questions = _cached_ask_stackoverflow(query) or _cached_ask_google(error_info["message"], cmd_args.n_questions)
 
-    answers = _cached_answer_content(questions)
+    answers = _cached_answer_content(questions, workers=cmd_args.workers)
     return questions, answers
 
 
@@ -161,23 +314,24 @@ def ask_live(query, error_info, cmd_args):
         # force a google search if stackoverflow didn't provide any answer
         questions = _ask_stackoverflow(query) or _ask_google(error_info["message"], cmd_args.n_questions)
 
-    answers = _get_answer_content(questions)
+    answers = _get_answer_content(questions, workers=cmd_args.workers)
     return questions, answers
 
 
-@filecache(MONTH)
+@cached(MONTH, negative=True, errors=(ApiError,), stale=True)
 def _cached_answer_content(*args, **kwargs):
     """ get_answer_content decorated with a cache """
     return _get_answer_content(*args, **kwargs)
 
 
-@filecache(MONTH)
+@cached(MONTH, negative=True, errors=(ApiError,), stale=True)
 def _cached_ask_stackoverflow(*args, **kwargs):
     """ ask_stackoverflow decorated with a cache """
     return _ask_stackoverflow(*args, **kwargs)
 
 
-@filecache(MONTH)
+# google errors are mostly rate limits and network failures, which don't last, so they are not cached
+@cached(MONTH, negative=True, stale=True)
 def _cached_ask_google(*args, **kwargs):
     """ ask_google decorated with a cache """
     return _ask_google(*args, **kwargs)
@@ -0,0 +1,143 @@
+"""This module diagnoses many scripts in a single run. Scripts are inspected
+in parallel on a pool of processes, then the answers for each distinct error
+query are retrieved only once and shared by every script with that error."""
+import io
+import json
+import os
+import sys
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext, redirect_stdout
+from functools import partial
+from typing import Iterator, Union
+
+from .errors import handle_error
+from .inspection import get_error_info
+
+# error_info fields kept in the results, the source code and traceback are left out
+RESULT_FIELDS = ["message", "type", "line", "offending_line"]
+
+
+def run_batch(source: str, output: str, cmd_args: Namespace) -> dict:
+    """Diagnose every script of source and write one json record per script to output.
+    source can be a directory of python scripts or a jsonl file where each line has
+    a "file" and, optionally, the "traceback" that script printed.
+    output: some counts about the run
+    """
+
+    tasks = list(iter_tasks(source))
+    diagnose_task = partial(diagnose, cmd_args=cmd_args)
+
+    with ProcessPoolExecutor(max_workers=cmd_args.jobs) as executor:
+        records = list(executor.map(diagnose_task, tasks, chunksize=max(1, len(tasks) // (cmd_args.jobs * 4))))
+
+    # scripts with the same error share the same query, which is looked up only once
+    representatives = {}
+    for record in records:
+        if record["status"] == "error":
+            representatives.setdefault(_lookup_key(record), record)
+
+    def lookup(record):
+        try:
+            return get_record_answers(record, cmd_args), None
+        except Exception as error:
+            # a failed lookup, like google limiting its scraping, only fails the scripts with that error
+            return None, repr(error)
+
+    with ThreadPoolExecutor(max_workers=cmd_args.jobs) as executor:
+        answers = dict(zip(representatives, executor.map(lookup, representatives.values())))
+
+    errors = sum(record["status"] == "error" for record in records)
+
+    with _open_output(output) as stream:
+        for record in records:
+            if record["status"] == "error":
+                record_answers, reason = answers[_lookup_key(record)]
+                if reason is None:
+                    record["answers"] = record_answers
+                else:
+                    record.update(status="failed", reason=f"could not retrieve answers: {reason}")
+            stream.write(json.dumps(record) + "\n")
+
+    return {
+        "scripts": len(records),
+        "errors": errors,
+        "distinct_errors": len(representatives),
+    }
+
+
+def iter_tasks(source: str) -> Iterator[dict]:
+    """Yield a task for each script to be diagnosed."""
+
+    if os.path.isdir(source):
+        for root, _, files in sorted(os.walk(source)):
+            for name in sorted(files):
+                if name.endswith(".py"):
+                    yield {"file": os.path.join(root, name)}
+        return
+
+    with open(source, "r") as jsonl:
+        for line in jsonl:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # diagnose records the line as an invalid task
+                yield line.strip()
+
+
+def diagnose(task: dict, cmd_args: Namespace) -> dict:
+    """Inspect a script and handle its error, without retrieving answers.
+    This runs on a worker process, so messages printed to the user are captured."""
+
+    if not isinstance(task, dict) or not task.get("file"):
+        return {"file": None, "status": "failed", "reason": f"invalid task: {task!r}"}
+
+    record = {"file": task["file"], "status": "error"}
+    if "id" in task:
+        record["id"] = task["id"]
+
+    try:
+        with redirect_stdout(io.StringIO()):
+            error_info = get_error_info(task["file"], stderr=task.get("traceback"), in_process=cmd_args.in_process)
+            query, pycee_hint, _ = handle_error(error_info, cmd_args)
+    except SystemExit as exit:
+        record["status"] = "no_error" if exit.code == 0 else "failed"
+        return record
+    except Exception as error:
+        record.update(status="failed", reason=repr(error))
+        return record
+
+    record.update({field: error_info[field] for field in RESULT_FIELDS})
+    record.update(query=query, hint=pycee_hint)
+    return record
+
+
+def get_record_answers(record: dict, cmd_args: Namespace) -> list:
+    """Retrieve the answers for the error of a record."""
+
+    # imported here so worker processes never load the network stack
+    from .answers import get_answers
+
+    # answers missing because the API can't be used fail the record instead of leaving it without answers
+    markdown_answers, answers = get_answers(record["query"], record, cmd_args, strict=True)
+
+    return [
+        {"id": a.id, "score": a.score, "accepted": a.accepted, "author": a.author, "markdown": markdown}
+        for markdown, a in zip(markdown_answers, answers)
+    ]
+
+
+def _lookup_key(record: dict) -> Union[str, tuple]:
+    """Records without a query are searched on google by their message."""
+
+    return record["query"] or ("google", record["message"])
+
+
+def _open_output(output: str):
+    """Results go to the standard output when output is '-'."""
+
+    if output == "-":
+        return nullcontext(sys.stdout)
+    return open(output, "w")
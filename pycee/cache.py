@@ -0,0 +1,563 @@
+"""This module implements the local cache of questions and answers.
+Entries live in a single SQLite database using write-ahead logging, so many
+pycee processes can read and write it at once. Each entry has its own time to live
+and the least recently used entries are evicted when the cache grows past its maximum size.
+Empty and failed results are negative entries, kept for a short time only.
+Expired entries are kept a while longer, so they can be served while being refreshed."""
+import atexit
+import functools
+import gzip
+import hashlib
+import json
+import os
+import pathlib
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from .locks import file_lock
+from .profiling import span
+from .utils import Answer, Question
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+MONTH = 30 * DAY
+
+DEFAULT_TTL = MONTH
+# time to live of negative entries, can be set (in seconds) through PYCEE_NEGATIVE_TTL
+NEGATIVE_TTL = 30 * MINUTE
+# how long after expiring an entry can still be served while it is refreshed
+MAX_STALENESS = MONTH
+# seconds an exiting process waits for its background refreshes, unfinished ones are dropped
+REFRESH_EXIT_WAIT = 0.5
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024  # bytes
+CACHE_FILE_NAME = "cache.sqlite3"
+# directory of the lock files used to compute each missing value only once
+LOCKS_DIR_NAME = "locks"
+# seconds a process waits for another one to release the database
+BUSY_TIMEOUT = 30
+# seconds an error that is not cached is kept for the processes that waited on its computation
+FAILURE_NOTICE_TTL = MINUTE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    negative INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+"""
+
+# bundles are gzipped json lines: a header followed by one line per entry.
+# Values are stored as plain data and rebuilt on import, never unpickled.
+BUNDLE_FORMAT = "pycee-cache-bundle"
+BUNDLE_VERSION = 2
+
+# fields of answers stored in bundles, bodies are stored as text
+ANSWER_FIELDS = ["id", "accepted", "score", "body", "author", "profile_image", "last_edit"]
+
+# sentinel to tell a cache miss from a cached None
+_MISSING = object()
+
+
+def negative_ttl() -> float:
+    """Time to live of negative entries."""
+
+    try:
+        return float(os.environ.get("PYCEE_NEGATIVE_TTL", NEGATIVE_TTL))
+    except ValueError:
+        return NEGATIVE_TTL
+
+
+def cache_dir() -> pathlib.Path:
+    """Directory of the cache files, following the XDG base directory specification."""
+
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(pathlib.Path.home(), ".cache")
+    return pathlib.Path(xdg_cache_home) / "pycee"
+
+
+class Cache:
+    """A key-value store of picklable objects backed by SQLite."""
+
+    def __init__(self, path=None, max_size: int = DEFAULT_MAX_SIZE):
+        self.path = pathlib.Path(path) if path else cache_dir() / CACHE_FILE_NAME
+        self.max_size = max_size
+        self._local = threading.local()
+
+    def get(self, key: str, default=None):
+        """Return the value stored under key, or default if missing or expired."""
+
+        value, fresh = self.lookup(key)
+        return value if fresh else default
+
+    def lookup(self, key: str, max_staleness: float = 0) -> tuple:
+        """Return the value stored under key and whether it is fresh, as a (value, fresh) tuple.
+        Positive entries that expired less than max_staleness seconds ago are stale,
+        older and missing ones give (_MISSING, False)."""
+
+        now = time.time()
+        row = self._connection().execute(
+            "SELECT value, expires_at, negative FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None:
+            return _MISSING, False
+
+        blob, expires_at, negative = row
+        fresh = expires_at > now
+        if not fresh and (negative or expires_at + min(max_staleness, MAX_STALENESS) <= now):
+            return _MISSING, False
+
+        self._connection().execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return pickle.loads(blob), fresh
+
+    def set(self, key: str, value, ttl: float = DEFAULT_TTL, negative: bool = False):
+        """Store value under key for ttl seconds, evicting entries if needed.
+        negative tells an empty or failed result, which is never exported."""
+
+        now = time.time()
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        connection = self._connection()
+
+        with self._transaction(connection):
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, stored_at, expires_at, accessed_at, negative)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now, now + ttl, now, negative),
+            )
+            self._evict(connection, now)
+
+    def delete(self, key: str):
+        """Remove the entry stored under key, if any."""
+
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        """Remove all entries."""
+
+        self._connection().execute("DELETE FROM entries")
+
+    def size(self) -> int:
+        """Total size in bytes of the stored values."""
+
+        return self._connection().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def entries(self):
+        """Iterate over the positive entries that have not expired yet
+        as (key, pickled value, stored_at, expires_at) tuples."""
+
+        return self._connection().execute(
+            "SELECT key, value, stored_at, expires_at FROM entries WHERE expires_at > ? AND NOT negative",
+            (time.time(),),
+        )
+
+    def add_entries(self, entries) -> int:
+        """Add (key, pickled value, stored_at, expires_at) entries,
+        keeping the newest one when a key is already stored.
+        output: the number of entries added"""
+
+        now = time.time()
+        connection = self._connection()
+        added = 0
+
+        with self._transaction(connection):
+            for key, blob, stored_at, expires_at in entries:
+                if expires_at <= now:
+                    continue
+                row = connection.execute("SELECT stored_at FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[0] >= stored_at:
+                    continue
+                connection.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, stored_at, expires_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, blob, len(blob), stored_at, expires_at, now),
+                )
+                added += 1
+            self._evict(connection, now)
+
+        return added
+
+    def close(self):
+        """Close the connection of the current thread."""
+
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _evict(self, connection: sqlite3.Connection, now: float):
+        """Drop entries too old to be served even while refreshed, then
+        the least recently used ones until the cache fits its maximum size."""
+
+        connection.execute(
+            "DELETE FROM entries WHERE expires_at <= ? AND (negative OR expires_at <= ?)", (now, now - MAX_STALENESS)
+        )
+        excess = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0] - self.max_size
+
+        if excess <= 0:
+            return
+
+        rows = connection.execute("SELECT key, size FROM entries ORDER BY accessed_at")
+        evicted = []
+        for key, size in rows:
+            if excess <= 0:
+                break
+            evicted.append((key,))
+            excess -= size
+
+        connection.executemany("DELETE FROM entries WHERE key = ?", evicted)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Each thread (and each forked process) gets its own connection."""
+
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = self._connect()
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # isolation_level=None leaves transactions to be opened explicitly
+        connection = sqlite3.connect(str(self.path), timeout=BUSY_TIMEOUT, isolation_level=None)
+        self._enable_wal(connection)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        with self._transaction(connection):
+            for statement in SCHEMA.split(";"):
+                connection.execute(statement)
+        self._migrate(connection)
+        return connection
+
+    @staticmethod
+    def _enable_wal(connection: sqlite3.Connection):
+        """Switching to write-ahead logging fails at once, instead of waiting,
+        while other processes create the database, so it is retried."""
+
+        deadline = time.monotonic() + BUSY_TIMEOUT
+        while True:
+            try:
+                connection.execute("PRAGMA journal_mode=WAL")
+                return
+            except sqlite3.OperationalError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.01)
+
+    @staticmethod
+    def _migrate(connection: sqlite3.Connection):
+        """Caches created by previous versions have no negative column."""
+
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(entries)")]
+        if "negative" in columns:
+            return
+        try:
+            connection.execute("ALTER TABLE entries ADD COLUMN negative INTEGER NOT NULL DEFAULT 0")
+        except sqlite3.OperationalError:
+            # another process added it first
+            pass
+
+    @staticmethod
+    @contextmanager
+    def _transaction(connection: sqlite3.Connection):
+        """Take the write lock upfront so concurrent writers queue up
+        instead of failing when upgrading a read lock."""
+
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Cache:
+    """Return the cache shared by the whole process."""
+
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = Cache()
+
+    return _cache
+
+
+def export_bundle(file_path, cache: Cache = None) -> int:
+    """Write all entries that have not expired to a compressed bundle file.
+    Entries holding values that can't be stored as plain data are left out.
+    output: the number of exported entries"""
+
+    cache = cache or get_cache()
+    exported = 0
+
+    with gzip.open(file_path, "wt", encoding="utf-8") as bundle:
+        header = {"format": BUNDLE_FORMAT, "version": BUNDLE_VERSION, "created_at": time.time()}
+        bundle.write(json.dumps(header) + "\n")
+        for key, blob, stored_at, expires_at in cache.entries():
+            try:
+                value = _to_data(pickle.loads(blob))
+            except TypeError:
+                continue
+            record = {"key": key, "value": value, "stored_at": stored_at, "expires_at": expires_at}
+            bundle.write(json.dumps(record) + "\n")
+            exported += 1
+
+    return exported
+
+
+def import_bundle(file_path, cache: Cache = None) -> int:
+    """Load the entries of a bundle created by export_bundle into the cache.
+    Values are rebuilt from plain data, so bundles can't run any code.
+    output: the number of imported entries"""
+
+    cache = cache or get_cache()
+
+    with gzip.open(file_path, "rt", encoding="utf-8") as bundle:
+        header = json.loads(bundle.readline() or "{}")
+        if header.get("format") != BUNDLE_FORMAT:
+            raise ValueError(f"{file_path} is not a pycee cache bundle")
+        if header.get("version") != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported cache bundle version: {header.get('version')}")
+
+        return cache.add_entries(_bundle_entry(json.loads(line)) for line in bundle)
+
+
+def _bundle_entry(record) -> tuple:
+    """Entry of a bundle record, as taken by Cache.add_entries."""
+
+    try:
+        value = pickle.dumps(_from_data(record["value"]), protocol=pickle.HIGHEST_PROTOCOL)
+        return str(record["key"]), value, float(record["stored_at"]), float(record["expires_at"])
+    except (KeyError, TypeError, AttributeError) as error:
+        raise ValueError(f"Malformed cache bundle record: {error!r}")
+
+
+def _to_data(value):
+    """Cached value as plain json data. Containers and the namedtuples
+    of pycee are tagged, so they can be told apart on import.
+    Example:
+    input: (Question(id="1", has_accepted=True),)
+    output: {"tuple": [{"question": {"id": "1", "has_accepted": True}}]}
+    """
+
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Question):
+        return {"question": value._asdict()}
+    if isinstance(value, Answer):
+        return {"answer": {name: getattr(value, name) for name in ANSWER_FIELDS}}
+    if isinstance(value, (tuple, list)):
+        return {type(value).__name__: [_to_data(item) for item in value]}
+    if isinstance(value, dict) and all(isinstance(key, str) for key in value):
+        return {"dict": {key: _to_data(item) for key, item in value.items()}}
+    raise TypeError(f"{type(value).__name__} values can't be exported")
+
+
+def _from_data(data):
+    """Rebuild a value from the plain data given by _to_data."""
+
+    if not isinstance(data, dict):
+        return data
+    if len(data) != 1:
+        raise TypeError("values are tagged by a single key")
+
+    tag, content = next(iter(data.items()))
+    if tag == "question":
+        return Question(id=content["id"], has_accepted=content["has_accepted"])
+    if tag == "answer":
+        return Answer(**{name: content[name] for name in ANSWER_FIELDS})
+    if tag == "tuple":
+        return tuple(_from_data(item) for item in content)
+    if tag == "list":
+        return [_from_data(item) for item in content]
+    if tag == "dict":
+        return {str(key): _from_data(item) for key, item in content.items()}
+    raise TypeError(f"unknown value tag {tag!r}")
+
+
+def key_lock(key: str, blocking: bool = True):
+    """Lock held while computing the value of key. Processes missing the same key
+    at once, like a classroom hitting the same error, wait for the first one
+    to compute it instead of computing it again."""
+
+    name = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+    return file_lock(cache_dir() / LOCKS_DIR_NAME / f"{name}.lock", blocking=blocking)
+
+
+def remove_key_locks() -> int:
+    """Remove the lock files of keys, one is left for every key computed.
+    Locks held by running processes are kept.
+    output: the number of removed lock files"""
+
+    removed = 0
+
+    for path in (cache_dir() / LOCKS_DIR_NAME).glob("*.lock"):
+        with file_lock(path, blocking=False) as locked:
+            if locked:
+                path.unlink()
+                removed += 1
+
+    return removed
+
+
+class _Failure:
+    """A cached error, raised again on cache hits."""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+def cached(ttl: float = DEFAULT_TTL, negative: bool = False, errors: tuple = (), stale: bool = False):
+    """Decorate a function so its results are kept in the cache for ttl seconds.
+    Only positional arguments make up the cache key: keyword arguments
+    may change how a value is computed, but not the value itself.
+    Concurrent calls with the same key, from any process, compute the value only once.
+    With negative, empty results and the given errors are cached for negative_ttl() seconds,
+    so dead ends are not tried again on every run, but not for long either.
+    With stale, expired values are returned right away and refreshed in the background,
+    until they are MAX_STALENESS seconds past expiring.
+    The decorated function gets two helpers for callers computing values on their own:
+    peek(*args) gives the cached value or None, without computing it,
+    and store(value, *args) caches a value computed elsewhere."""
+
+    def decorator(func):
+        def lookup(key, args, kwargs, cache_span):
+            value, fresh = get_cache().lookup(key, MAX_STALENESS if stale else 0)
+            cache_span.set_attribute("cache_hit", value is not _MISSING)
+            if value is not _MISSING and not fresh:
+                cache_span.set_attribute("stale", True)
+                _refresh_in_background(func, args, kwargs, key, ttl)
+            return value
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            key = f"{func.__name__}{args!r}"
+
+            with span("cache", function=func.__name__) as cache_span:
+                value = lookup(key, args, kwargs, cache_span)
+
+                if value is _MISSING:
+                    waiting_since = time.time()
+                    with key_lock(key):
+                        # the value may have been computed, or have failed, while waiting for the lock
+                        value = cache.get(key, _MISSING)
+                        if value is _MISSING:
+                            value = _failure_since(cache, key, waiting_since)
+                        if value is _MISSING:
+                            value = _compute(func, args, kwargs, cache, key, ttl, negative, errors)
+
+                if isinstance(value, _Failure):
+                    raise value.error
+                return value
+
+        def peek(*args):
+            with span("cache", function=func.__name__) as cache_span:
+                value = lookup(f"{func.__name__}{args!r}", args, {}, cache_span)
+            if isinstance(value, _Failure):
+                raise value.error
+            return None if value is _MISSING else value
+
+        def store(value, *args):
+            _store(get_cache(), f"{func.__name__}{args!r}", value, ttl, negative)
+
+        wrapper.peek, wrapper.store = peek, store
+        return wrapper
+
+    return decorator
+
+
+def _compute(func, args, kwargs, cache: Cache, key: str, ttl: float, negative: bool, errors: tuple):
+    """Call func and cache its result, or its error when it is one of errors.
+    Other errors are only noted for the processes already waiting on key,
+    so they fail at once instead of trying again one after another."""
+
+    try:
+        value = func(*args, **kwargs)
+    except errors as error:
+        cache.set(key, _Failure(error), negative_ttl(), negative=True)
+        raise
+    except Exception as error:
+        try:
+            cache.set(_failure_key(key), (time.time(), _Failure(error)), FAILURE_NOTICE_TTL, negative=True)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            pass  # waiters will try again themselves
+        raise
+
+    _store(cache, key, value, ttl, negative)
+    return value
+
+
+def _failure_key(key: str) -> str:
+    return f"failure:{key}"
+
+
+def _failure_since(cache: Cache, key: str, since: float):
+    """The error computing key raised after since, if any, or _MISSING.
+    Calls made after the error was noted compute the value again."""
+
+    failed_at, failure = cache.get(_failure_key(key), (0, _MISSING))
+    return failure if failed_at >= since else _MISSING
+
+
+def _store(cache: Cache, key: str, value, ttl: float, negative: bool):
+
+    if negative and not value:
+        cache.set(key, value, negative_ttl(), negative=True)
+    else:
+        cache.set(key, value, ttl)
+
+
+_refreshes = []
+_refreshes_lock = threading.Lock()
+
+
+def _refresh_in_background(func, args, kwargs, key: str, ttl: float):
+    """Compute a stale value again on another thread. Refreshes already under
+    way in any process are not repeated, and failed or empty refreshes
+    keep the stale value. Exiting processes wait REFRESH_EXIT_WAIT seconds at most
+    for their refreshes, so callers waiting for pycee to exit don't wait on the network.
+    Dropped refreshes are started again by the next run serving the stale value."""
+
+    def refresh():
+        with key_lock(key, blocking=False) as locked:
+            if not locked or get_cache().get(key, _MISSING) is not _MISSING:
+                return
+            try:
+                value = func(*args, **kwargs)
+            except Exception:
+                return
+            if value:
+                get_cache().set(key, value, ttl)
+
+    thread = threading.Thread(target=refresh, name=f"pycee-refresh-{func.__name__}", daemon=True)
+    with _refreshes_lock:
+        _refreshes[:] = [t for t in _refreshes if t.is_alive()] + [thread]
+    thread.start()
+
+
+def wait_for_refreshes(timeout: float = None):
+    """Wait for the background refreshes started so far, up to timeout seconds in total."""
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with _refreshes_lock:
+        threads = list(_refreshes)
+    for thread in threads:
+        thread.join(None if deadline is None else max(0, deadline - time.monotonic()))
+
+
+atexit.register(wait_for_refreshes, REFRESH_EXIT_WAIT)
+
@@ -1,5 +1,7 @@
 """Contains all the logic that handles code errors."""
 import re
+from collections import namedtuple
+from functools import lru_cache
 from typing import List, Union
 from argparse import Namespace
 
@@ -13,59 +15,89 @@ from .utils import (
 )
 
 
-def handle_error(error_info: dict, cmd_args: Namespace) -> tuple:
-    """Process the incoming error as needed and outputs three possible answer.
-    output:
-    query: an URL containing an stackoverflow query about the error.
-    pycee_hint: A possible answer for the error produced locally.
-    TODO: pydoc_answer: A possible answer extracted from the builtin help.
+# Handlers registry below
+# Each error type has a handler, which may declare templates of the messages it knows.
+# All templates are compiled into a single regex, so classifying a message takes one match.
+
+ErrorMatch = namedtuple("ErrorMatch", ["error_type", "template", "fields"])
+
+HANDLERS = {}
+TEMPLATES = []
+# placeholders look like {name} and match any text
+PLACEHOLDER_REGEX = r"\{(\w+)\}"
+
+
+def register_handler(error_type: str, templates: dict = None):
+    """Register a function as the handler of error_type.
+    The handler receives error_info and the ErrorMatch of the message (or None),
+    and returns the query and the pycee hint for the error.
+    templates maps names to the messages the handler knows, without the error type,
+    like "unsupported operand type(s) for {operator}: '{left}' and '{right}'".
+    When many templates match a message, the one registered first wins."""
+
+    def decorator(handler):
+        HANDLERS[error_type] = handler
+        for name, template in (templates or {}).items():
+            TEMPLATES.append((error_type, name, template))
+        _compile_templates.cache_clear()
+        return handler
+
+    return decorator
+
+
+def classify(error_message: str) -> Union[ErrorMatch, None]:
+    """Find which registered template an error message matches.
+    Example:
+    input: "TypeError: unsupported operand type(s) for +: 'int' and 'str'"
+    output: ErrorMatch(error_type='TypeError', template='unsupported operand',
+                       fields={'operator': '+', 'left': 'int', 'right': 'str'})
     """
 
-    pydoc_answer = None
-    pycee_hint = None
-    error_type = error_info["type"]
-    error_message = error_info["message"]
-    error_line = error_info["line"]
+    regex = _compile_templates()
+    match = regex.match(error_message) if regex else None
 
-    if error_type == "SyntaxError":
-        pycee_hint = handle_syntax_error_locally(error_message, error_line)
-        query = handle_syntax_error(error_message)
+    if match is None:
+        return None
 
-    elif error_type == "TabError":
-        query = handle_tab_error(error_message)
+    index = int(match.lastgroup[1:])
+    error_type, name, _ = TEMPLATES[index]
+    prefix = f"t{index}_"
+    fields = {group[len(prefix) :]: value for group, value in match.groupdict().items() if group.startswith(prefix)}
 
-    elif error_type == "IndentationError":
-        query = handle_indentation_error(error_message)
+    return ErrorMatch(error_type=error_type, template=name, fields=fields)
 
-    elif error_type == "IndexError":
-        pycee_hint = handle_index_error_locally(error_message, error_line)
-        query = handle_index_error(error_message)
 
-    elif error_type == "ModuleNotFoundError":
-        pycee_hint = handle_module_error_locally(error_message)
-        query = handle_module_not_found_error(error_message)
+@lru_cache(maxsize=None)
+def _compile_templates():
+    """Build one alternation of all templates, where the group named t<i>
+    matches the i-th template and the groups named t<i>_<field> its placeholders."""
 
-    elif error_type == "TypeError":
-        query = handle_type_error(error_message)
+    alternatives = []
 
-    elif error_type == "KeyError":
-        pycee_hint = handle_key_error_locally(error_message, error_info["offending_line"])
-        query = handle_key_error(error_message)
+    for i, (error_type, _, template) in enumerate(TEMPLATES):
+        literals = re.split(PLACEHOLDER_REGEX, template)
+        # re.split alternates literal text and placeholder names
+        pattern = "".join(
+            re.escape(part) if j % 2 == 0 else f"(?P<t{i}_{part}>.+?)" for j, part in enumerate(literals)
+        )
+        alternatives.append(f"(?P<t{i}>{re.escape(error_type)}: {pattern})$")
 
-    elif error_type == "AttributeError":
-        query = handle_attr_error(error_message)
+    return re.compile("|".join(alternatives)) if alternatives else None
 
-    elif error_type == "NameError":
-        pycee_hint = handle_name_error_locally(error_message)
-        query = handle_name_error(error_message)
 
-    elif error_type == "ZeroDivisionError":
-        pycee_hint = handle_zero_division_error_locally(error_line)
-        query = handle_zero_division_error(error_message)
+def handle_error(error_info: dict, cmd_args: Namespace) -> tuple:
+    """Process the incoming error as needed and outputs three possible answer.
+    output:
+    query: an URL containing an stackoverflow query about the error.
+    pycee_hint: A possible answer for the error produced locally.
+    TODO: pydoc_answer: A possible answer extracted from the builtin help.
+    """
 
-    else:
-        query = url_for_error(error_message)  # default query
+    pydoc_answer = None
+    error_message = error_info["message"]
+    handler = HANDLERS.get(error_info["type"], handle_unknown_error)
 
+    query, pycee_hint = handler(error_info, classify(error_message))
     query = set_pagesize(query, cmd_args.n_questions) if query else None
 
     if cmd_args.dry_run:
@@ -75,6 +107,12 @@ def handle_error(error_info: dict, cmd_args: Namespace) -> tuple:
     return query, pycee_hint, pydoc_answer
 
 
+def handle_unknown_error(error_info: dict, match: Union[ErrorMatch, None]) -> tuple:
+    """Errors without a handler are searched using their message as is."""
+
+    return url_for_error(error_info["message"]), None  # default query
+
+
 def handle_key_error_locally(error_message: str, offending_line: str) -> str:
     """When KeyError is handled locally we remind the user that the problematic
     dict should have a key with a certain value."""
@@ -147,17 +185,13 @@ def handle_module_not_found_error(error_message: str) -> str:
     return url_for_error(message)
 
 
-def handle_index_error_locally(error_message: str, error_line: int) -> str:
-    """Process an IndexError locally."""
+def handle_index_error_locally(match: Union[ErrorMatch, None], error_line: int) -> Union[str, None]:
+    """Process an IndexError locally, given the ErrorMatch of its message."""
 
-    sequence = None
-    if "list" in error_message:
-        sequence = "list"
-    elif "tuple" in error_message:
-        sequence = "tuple"
-    elif "range object" in error_message:
-        sequence = "range object"
+    if match is None or "sequence" not in match.fields:
+        return None
 
+    sequence = match.fields["sequence"]
     hint = HINT_MESSAGES["IndexError"].replace("<sequence>", sequence)
     hint = hint.replace("<line>", str(error_line))
 
@@ -215,14 +249,14 @@ def handle_tab_error(error_message: str) -> str:
     return url_for_error(message)
 
 
-def handle_type_error(error_message: str) -> str:
-    """Process an TypeError."""
+def handle_type_error(error_message: str, match: Union[ErrorMatch, None]) -> str:
+    """Process an TypeError, given the ErrorMatch of its message."""
 
-    hint1 = "the first argument must be callable"
-    hint2 = "not all arguments converted during string formatting"
-    if hint1 in error_message:
+    template = match.template if match else None
+
+    if template == "first argument must be callable":
         message = "must have first callable argument"
-    elif hint2 in error_message:
+    elif template == "string formatting":
         message = remove_exception_from_error_message(error_message)
     else:
         return url_for_error(error_message)
@@ -315,3 +349,77 @@ def define_hint_for_key_error_locally(target, missing_key, indentifiers):
         hint = hint.replace("<key>", missing_key)
 
     return hint
+
+
+# Registered handlers below
+
+
+@register_handler("SyntaxError", {"invalid syntax": "invalid syntax"})
+def _syntax_error(error_info, match):
+    message = error_info["message"]
+    return handle_syntax_error(message), handle_syntax_error_locally(message, error_info["line"])
+
+
+@register_handler("TabError")
+def _tab_error(error_info, match):
+    return handle_tab_error(error_info["message"]), None
+
+
+@register_handler("IndentationError")
+def _indentation_error(error_info, match):
+    return handle_indentation_error(error_info["message"]), None
+
+
+@register_handler(
+    "IndexError",
+    {
+        "assignment out of range": "{sequence} assignment index out of range",
+        # raised by list.pop(i) and array.pop(i), which don't name the sequence
+        "pop out of range": "pop index out of range",
+        "out of range": "{sequence} index out of range",
+        "pop from empty": "pop from empty {sequence}",
+    },
+)
+def _index_error(error_info, match):
+    message = error_info["message"]
+    return handle_index_error(message), handle_index_error_locally(match, error_info["line"])
+
+
+@register_handler("ModuleNotFoundError", {"no module named": "No module named '{module}'"})
+def _module_not_found_error(error_info, match):
+    message = error_info["message"]
+    return handle_module_not_found_error(message), handle_module_error_locally(message)
+
+
+@register_handler(
+    "TypeError",
+    {
+        "first argument must be callable": "the first argument must be callable",
+        "string formatting": "not all arguments converted during string formatting",
+        "unsupported operand": "unsupported operand type(s) for {operator}: '{left}' and '{right}'",
+    },
+)
+def _type_error(error_info, match):
+    return handle_type_error(error_info["message"], match), None
+
+
+@register_handler("KeyError")
+def _key_error(error_info, match):
+    message = error_info["message"]
+    return handle_key_error(message), handle_key_error_locally(message, error_info["offending_line"])
+
+
+@register_handler("AttributeError")
+def _attr_error(error_info, match):
+    return handle_attr_error(error_info["message"]), None
+
+
+@register_handler("NameError", {"name not defined": "name '{name}' is not defined"})
+def _name_error(error_info, match):
+    message = error_info["message"]
+    return handle_name_error(message), handle_name_error_locally(message)
+
+
+@register_handler("ZeroDivisionError")
+def _zero_division_error(error_info, match):
+    return handle_zero_division_error(error_info["message"]), handle_zero_division_error_locally(error_info["line"])
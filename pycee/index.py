@@ -0,0 +1,215 @@
+"""This module implements an offline search backend built from the public
+StackOverflow data dump. Python questions and their answers are imported into
+a local SQLite database with a full-text index (FTS5) of question titles, so
+questions and answers can be found without accessing the network."""
+import os
+import pathlib
+import re
+import sqlite3
+from collections import defaultdict
+from typing import Tuple
+from urllib.parse import urlsplit, parse_qs
+from xml.etree.ElementTree import iterparse
+
+from .utils import Question
+
+INDEX_FILE_NAME = "index.sqlite3"
+# rows written between each commit while importing a dump
+COMMIT_EVERY = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    accepted_answer_id INTEGER,
+    is_answered INTEGER NOT NULL DEFAULT 0
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS questions_title USING fts5(title, content='questions', content_rowid='id');
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY,
+    question_id INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    author TEXT
+);
+CREATE INDEX IF NOT EXISTS answers_question_id ON answers (question_id, score DESC);
+"""
+
+
+def index_path() -> pathlib.Path:
+    """Path of the index, following the XDG base directory specification."""
+
+    xdg_data_home = os.environ.get("XDG_DATA_HOME") or os.path.join(pathlib.Path.home(), ".local", "share")
+    return pathlib.Path(xdg_data_home) / "pycee" / INDEX_FILE_NAME
+
+
+def connect(path=None) -> sqlite3.Connection:
+    """Open the index, creating its tables if needed."""
+
+    path = pathlib.Path(path) if path else index_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(str(path))
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def import_dump(dump_path, path=None, tag: str = "python") -> Tuple[int, int]:
+    """Import questions tagged with tag and their answers from a Posts.xml dump.
+    The dump is streamed row by row, and whether an answer belongs to an imported
+    question is checked against the index itself, so memory usage stays constant.
+    output: the number of imported questions and answers
+    """
+
+    connection = connect(path)
+    n_rows = n_questions = n_answers = 0
+
+    context = iterparse(str(dump_path), events=("start", "end"))
+    _, root = next(context)
+
+    for event, row in context:
+
+        if event != "end" or row.tag != "row":
+            continue
+
+        post_type = row.get("PostTypeId")
+
+        if post_type == "1" and tag in _parse_tags(row.get("Tags", "")):
+            _insert_question(connection, row)
+            n_questions += 1
+        elif post_type == "2" and _has_question(connection, row.get("ParentId")):
+            _insert_answer(connection, row)
+            n_answers += 1
+
+        # drop the parsed rows, otherwise the whole dump ends up in memory
+        root.clear()
+
+        n_rows += 1
+        if n_rows % COMMIT_EVERY == 0:
+            connection.commit()
+
+    connection.commit()
+    connection.close()
+
+    return n_questions, n_answers
+
+
+def search(query: str, path=None) -> Tuple[Question, None]:
+    """Search the index for answered questions using the parameters of a
+    StackExchange API search url, as built by errors.url_for_error.
+    Titles must contain the intitle words, in order, and results are sorted by relevance."""
+
+    if query is None:
+        return tuple()
+
+    params = parse_qs(urlsplit(query).query)
+    words = " ".join(params.get("intitle", [""])).split()
+    pagesize = int(params.get("pagesize", ["30"])[0])
+
+    if not words:
+        return tuple()
+
+    # a quoted phrase matches the words in sequence, like the intitle parameter of the API
+    phrase = '"' + " ".join(word.replace('"', '""') for word in words) + '"'
+    rows = _connection_for(path).execute(
+        "SELECT questions.id, questions.accepted_answer_id FROM questions_title"
+        " JOIN questions ON questions.id = questions_title.rowid"
+        " WHERE questions_title MATCH ? AND questions.is_answered"
+        " ORDER BY questions_title.rank LIMIT ?",
+        (phrase, pagesize),
+    )
+
+    return tuple(Question(id=str(qid), has_accepted=accepted_id is not None) for qid, accepted_id in rows)
+
+
+def answer_items(question_ids: list, path=None) -> dict:
+    """Get the answers of each question, shaped like the items of the answers API.
+    output: a dict mapping each question id to its answers, sorted by score
+    """
+
+    items_by_question = defaultdict(list)
+    if not question_ids:
+        return items_by_question
+
+    placeholders = ",".join("?" * len(question_ids))
+    rows = _connection_for(path).execute(
+        "SELECT answers.id, answers.question_id, answers.score, answers.body, answers.author,"
+        " answers.id = questions.accepted_answer_id"
+        " FROM answers JOIN questions ON questions.id = answers.question_id"
+        f" WHERE answers.question_id IN ({placeholders})"
+        " ORDER BY answers.score DESC",
+        [int(qid) for qid in question_ids],
+    )
+
+    for answer_id, question_id, score, body, author, is_accepted in rows:
+        items_by_question[str(question_id)].append(
+            {
+                "answer_id": answer_id,
+                "question_id": question_id,
+                "score": score,
+                "body": body,
+                "is_accepted": bool(is_accepted),
+                "owner": {"display_name": author},
+            }
+        )
+
+    return items_by_question
+
+
+_connections = {}
+
+
+def _connection_for(path=None) -> sqlite3.Connection:
+    """Searches reuse one connection per index."""
+
+    path = str(path or index_path())
+    if path not in _connections:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No offline index found at {path}, create one with 'pycee index import'")
+        _connections[path] = sqlite3.connect(path, check_same_thread=False)
+    return _connections[path]
+
+
+def _parse_tags(tags: str) -> list:
+    """Tags look like '<python><list>', or '|python|list|' on recent dumps."""
+
+    return re.findall(r"[^<>|]+", tags)
+
+
+def _has_question(connection: sqlite3.Connection, question_id: str) -> bool:
+
+    if question_id is None:
+        return False
+    return connection.execute("SELECT 1 FROM questions WHERE id = ?", (int(question_id),)).fetchone() is not None
+
+
+def _insert_question(connection: sqlite3.Connection, row):
+
+    question_id = int(row.get("Id"))
+    title = row.get("Title", "")
+    accepted_answer_id = row.get("AcceptedAnswerId")
+
+    cursor = connection.execute(
+        "INSERT OR IGNORE INTO questions (id, title, score, accepted_answer_id) VALUES (?, ?, ?, ?)",
+        (question_id, title, int(row.get("Score", 0)), accepted_answer_id and int(accepted_answer_id)),
+    )
+    # questions already imported by a previous run are indexed already
+    if cursor.rowcount:
+        connection.execute("INSERT INTO questions_title (rowid, title) VALUES (?, ?)", (question_id, title))
+
+
+def _insert_answer(connection: sqlite3.Connection, row):
+
+    question_id = int(row.get("ParentId"))
+    score = int(row.get("Score", 0))
+    author = row.get("OwnerDisplayName") or (row.get("OwnerUserId") and "user" + row.get("OwnerUserId"))
+
+    connection.execute(
+        "INSERT OR REPLACE INTO answers (id, question_id, score, body, author) VALUES (?, ?, ?, ?, ?)",
+        (int(row.get("Id")), question_id, score, row.get("Body", ""), author),
+    )
+    # the API considers a question answered when it has an accepted or an upvoted answer
+    connection.execute(
+        "UPDATE questions SET is_answered = 1 WHERE id = ? AND (accepted_answer_id IS NOT NULL OR ? > 0)",
+        (question_id, score),
+    )
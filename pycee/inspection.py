@@ -1,34 +1,84 @@
 """This module will inspect the error source code and the error log."""
+import os
 import re
+import shlex
 import sys
+from contextlib import redirect_stderr, redirect_stdout
 from pprint import pprint
+from runpy import run_path
+from traceback import format_exception, format_exception_only
 from dis import get_instructions
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 from subprocess import Popen, PIPE
-from typing import Union
+from typing import List, Union
 
+from .profiling import span
+from .source import get_source
 from .utils import BUILTINS
 
+Frame = namedtuple("Frame", ["file", "line", "function", "source"])
+# chain tells how an exception is related to the one before it: 'cause', 'context' or None
+ExceptionBlock = namedtuple("ExceptionBlock", ["frames", "message", "chain"])
+
+TRACEBACK_HEADER = "Traceback (most recent call last):"
+CHAIN_HEADERS = {
+    "The above exception was the direct cause of the following exception:": "cause",
+    "During handling of the above exception, another exception occurred:": "context",
+}
+SOURCE_INDENT = "    "
+# This will match a line like this
+# '  File "foo.py", line 666, in bar'
+FRAME_REGEX = re.compile(r'\s*File "([^"]*)", line (\d+)(?:, in (.*))?$')
+# This will match a line like this
+# '[Previous line repeated 996 more times]'
+REPEATED_REGEX = re.compile(r"\[Previous line repeated \d+ more times?\]$")
+
+
+def get_error_info(file_path, stderr=None, in_process=False, cwd=None, env=None):
+    """Summarize all error information we have available.
+    When in_process is set, the script runs in this interpreter and the
+    information comes from the raised exception instead of the traceback text.
+    Otherwise the script runs on a subprocess started at cwd with the env environment,
+    which by default are those of pycee."""
+
+    if in_process and not stderr:
+        exception = run_script_in_process(file_path)
+        if not exception:
+            print("Great! Your code seems to have no errors.")
+            sys.exit(0)
+        error_info = get_error_info_from_exception(file_path, exception)
+    else:
+        error_info = get_error_info_from_traceback(file_path, stderr, cwd, env)
 
-def get_error_info(file_path, stderr=None):
-    """Summarize all error information we have available."""
+    if not all(error_info.values()):
+        print("Aborting. Some data about the error is missing:")
+        pprint(error_info)
+        sys.exit(-1)
+
+    return error_info
+
+
+def get_error_info_from_traceback(file_path, stderr=None, cwd=None, env=None) -> dict:
+    """Gather error information parsing the traceback text, taken from stderr
+    or from the output of the script executed on a subprocess."""
 
     if stderr:
         traceback = stderr
     else:
-        traceback = get_traceback_from_script(file_path)
+        traceback = get_traceback_from_script(file_path, cwd, env)
         if not traceback:
             print("Great! Your code seems to have no errors.")
             sys.exit(0)
 
     error_message = get_error_message(traceback)
     error_type = get_error_type(error_message)
-    error_line = get_error_line(traceback)
-    file_name = get_file_name(traceback)
-    code = get_code(file_path)
-    offending_line = get_offending_line(error_line, code)
+    error_frame = get_error_frame(parse_traceback(traceback))
+    error_line = error_frame.line if error_frame else None
+    file_name = error_frame.file if error_frame else None
+    code = get_source(file_path)
+    offending_line = code.offending_line(error_line) if error_line else None
 
-    error_info = {
+    return {
         "traceback": traceback,
         "message": error_message,
         "type": error_type,
@@ -38,15 +88,87 @@ def get_error_info(file_path, stderr=None):
         "offending_line": offending_line,
     }
 
-    if not all(error_info.values()):
-        print("Aborting. Some data about the error is missing:")
-        pprint(error_info)
-        sys.exit(-1)
 
-    return error_info
+def get_error_info_from_exception(file_path: str, exception: BaseException) -> dict:
+    """Gather error information from an exception raised by the script.
+    Frames of the interpreter running the script are left out,
+    so the result is the same as when the script runs on a subprocess."""
+
+    tb = exception.__traceback__
+    while tb is not None and tb.tb_frame.f_code.co_filename != file_path:
+        tb = tb.tb_next
+
+    if tb is not None:
+        error_line = tb.tb_lineno
+        file_name = tb.tb_frame.f_code.co_filename
+    else:
+        # syntax errors are raised when compiling, before any frame of the script exists
+        error_line = getattr(exception, "lineno", None)
+        file_name = getattr(exception, "filename", None)
+
+    error_message = format_exception_only(type(exception), exception)[-1].strip()
+    code = get_source(file_path)
+
+    return {
+        "traceback": "".join(format_exception(type(exception), exception, tb)),
+        "message": error_message,
+        "type": get_error_type(error_message),
+        "line": error_line,
+        "file": file_name,
+        "code": code,
+        "offending_line": code.offending_line(error_line) if error_line else None,
+    }
+
+
+def run_script_in_process(file_path: str) -> Union[BaseException, None]:
+    """Run a python script in this interpreter, on a fresh module namespace,
+    which is much faster than starting another interpreter for it.
+    The script runs as __main__ with its own sys.argv and sys.path,
+    and whatever it prints is discarded, as it happens with subprocesses.
+    Modules imported from the directory of the script are unloaded afterwards,
+    so the next script run in this interpreter imports its own ones.
+    As stdout, sys.argv and sys.path are global, scripts must not run this way concurrently.
+
+    input:
+        file_path = path to the script passed as an arguement on the command line
+    output:
+        the exception raised by the script, or None if it ran without errors
+    """
+
+    script_dir = os.path.dirname(os.path.abspath(file_path))
+    saved_argv, saved_path, saved_modules = sys.argv[:], sys.path[:], set(sys.modules)
+    sys.argv = [file_path]
+    sys.path.insert(0, script_dir)
 
+    try:
+        with span("run_script", in_process=True), open(os.devnull, "w") as devnull:
+            with redirect_stdout(devnull), redirect_stderr(devnull):
+                run_path(file_path, run_name="__main__")
+    except SystemExit:
+        return None
+    except KeyboardInterrupt:
+        raise
+    except BaseException as exception:
+        return exception
+    finally:
+        sys.argv = saved_argv
+        sys.path[:] = saved_path
+        _unload_modules(set(sys.modules) - saved_modules, script_dir)
+
+    return None
+
+
+def _unload_modules(names: set, directory: str):
+    """Remove the modules loaded from files within directory. Other modules,
+    like installed packages, are kept, as some of them can't be loaded twice."""
 
-def get_traceback_from_script(file_path: str) -> Union[str, None]:
+    for name in names:
+        file_name = getattr(sys.modules.get(name), "__file__", None)
+        if file_name and os.path.abspath(file_name).startswith(os.path.join(directory, "")):
+            del sys.modules[name]
+
+
+def get_traceback_from_script(file_path: str, cwd: str = None, env: dict = None) -> Union[str, None]:
     """Get the traceback of a python script directly from the
     standard output (stdout) using a subprocess to execute the script.
 
@@ -58,14 +180,17 @@ def get_traceback_from_script(file_path: str) -> Union[str, None]:
 
     input:
         file_path = path to the script passed as an arguement on the command line
+        cwd = working directory of the script, by default the one of pycee
+        env = environment of the script (and of the shell finding python3), by default the one of pycee
     output:
         the traceback as a string
     """
 
-    command = "python3 " + str(file_path)
-    subprocess = Popen(command, shell=True, stdin=PIPE, stdout=PIPE, stderr=PIPE)
-    stderr = subprocess.stderr.read()
-    subprocess.kill()
+    command = "python3 " + shlex.quote(str(file_path))
+    with span("run_script", in_process=False):
+        subprocess = Popen(command, shell=True, cwd=cwd, env=env, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        stderr = subprocess.stderr.read()
+        subprocess.kill()
 
     return stderr.decode("utf-8") or None
 
@@ -117,19 +242,8 @@ def get_error_line(error_message: str) -> Union[int, None]:
     2  # <class 'int'>
     """
 
-    # This will match a line like this
-    # 'File "foo.py", line 666'
-    regex1 = r'File "(.)*", line\s(\d)*'
-    # This will match a undefinite number of digits
-    # at the end of a string (the error line)
-    regex2 = r"([0-9])*$"
-
-    try:
-        error_header = re.search(regex1, error_message)[0]
-        error_line = re.search(regex2, error_header)[0]
-        return int(error_line)
-    except TypeError:
-        return None
+    frame = get_error_frame(parse_traceback(error_message))
+    return frame.line if frame else None
 
 
 def get_file_name(error_message: str) -> Union[int, None]:
@@ -145,18 +259,79 @@ def get_file_name(error_message: str) -> Union[int, None]:
     output:
     'example_code.py'
     """
-    # This will match a line like this
-    # 'File "foo.py", line 666'
-    regex1 = r'File "(.)*", line\s(\d)*'
-    # This will match text between double quotes (file name)
-    regex2 = r'"(.)*"'
 
-    try:
-        error_header = re.search(regex1, error_message)[0]
-        file_name = re.search(regex2, error_header)[0]
-        return file_name[1:-1]  # remove double quotes
-    except TypeError:
-        return None
+    frame = get_error_frame(parse_traceback(error_message))
+    return frame.file if frame else None
+
+
+def get_error_frame(exceptions: List[ExceptionBlock]) -> Union[Frame, None]:
+    """The frame where the error originates in the user code: the outermost
+    frame of the exception that was raised last."""
+
+    for exception in reversed(exceptions):
+        if exception.frames:
+            return exception.frames[0]
+    return None
+
+
+def parse_traceback(traceback: str) -> List[ExceptionBlock]:
+    """Parse a traceback in a single pass over its lines.
+    Chained exceptions give one block each, the last one being the exception
+    that ended the program. Each line is matched at most once by a regex
+    without nested repetitions, so parsing takes linear time even on huge tracebacks.
+    Here's an example:
+
+    input:
+    Traceback (most recent call last):
+      File "example_code.py", line 4, in <module>
+        print(world_cup_titles[5])
+    IndexError: list index out of range
+
+    output:
+    [ExceptionBlock(frames=[Frame(file='example_code.py', line=4, function='<module>',
+                                  source='print(world_cup_titles[5])')],
+                    message='IndexError: list index out of range', chain=None)]
+    """
+
+    exceptions = []
+    frames, message_lines, chain = [], [], None
+    last_frame = None
+
+    for line in traceback.splitlines():
+
+        if line in CHAIN_HEADERS:
+            if frames or message_lines:
+                exceptions.append(ExceptionBlock(frames, "\n".join(message_lines), chain))
+            frames, message_lines, chain = [], [], CHAIN_HEADERS[line]
+            last_frame = None
+            continue
+
+        frame_match = FRAME_REGEX.match(line)
+        if frame_match:
+            file, line_number, function = frame_match.groups()
+            frames.append(Frame(file, int(line_number), function, None))
+            last_frame = len(frames) - 1
+            continue
+
+        stripped = line.strip()
+
+        if not stripped or line == TRACEBACK_HEADER or REPEATED_REGEX.match(stripped):
+            continue
+
+        if line.startswith(SOURCE_INDENT):
+            # the first indented line after a frame is its source,
+            # others are markers (^^^^) pointing to where the error is
+            if last_frame is not None and frames[last_frame].source is None:
+                frames[last_frame] = frames[last_frame]._replace(source=stripped)
+            continue
+
+        message_lines.append(line)
+        last_frame = None
+
+    if frames or message_lines:
+        exceptions.append(ExceptionBlock(frames, "\n".join(message_lines), chain))
+
+    return exceptions
 
 
 def get_code(file_path: str) -> str:
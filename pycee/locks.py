@@ -0,0 +1,37 @@
+"""This module implements file locks, which let pycee processes
+running at the same time coordinate through files."""
+import os
+import pathlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path, blocking: bool = True):
+    """Hold an exclusive lock on path while in the context.
+    When blocking is False, the context gives False instead of waiting for the lock.
+    Platforms without fcntl get no locking at all."""
+
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o600)
+
+    try:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
@@ -0,0 +1,44 @@
+"""This module chains the steps of a pycee run: inspecting the script,
+handling its error, retrieving answers and printing them.
+Answers need the network stack (requests, html2text, googlesearch), which is
+only imported when answers are asked for, so hint-only runs start faster."""
+from argparse import Namespace
+
+from .errors import handle_error
+from .inspection import get_error_info
+from .profiling import span
+from .utils import remove_cache, print_answers, print_answers_stream
+
+
+def run(args: Namespace):
+    """Diagnose the script at args.file_name and print what was found about its error."""
+
+    if args.rm_cache:
+        remove_cache()
+
+    with span("inspect", file=args.file_name):
+        error_info = get_error_info(args.file_name, in_process=args.in_process, cwd=args.cwd, env=args.env)
+    with span("handle", error_type=error_info["type"]):
+        query, pycee_hint, pydoc_answer = handle_error(error_info, args)
+
+    if args.stream:
+        answer_stream = ()
+        if args.show_so_answer:
+            from .answers import iter_answers
+
+            answer_stream = iter_answers(query, error_info, args)
+
+        with span("answers", stream=True):
+            print_answers_stream(answer_stream, pycee_hint, pydoc_answer, args)
+        return
+
+    so_answers = None
+
+    if args.show_so_answer:
+        from .answers import get_answers
+
+        with span("answers"):
+            so_answers = list(zip(*get_answers(query, error_info, args)))
+
+    with span("print"):
+        print_answers(so_answers, pycee_hint, pydoc_answer, args)
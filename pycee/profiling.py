@@ -0,0 +1,179 @@
+"""This module times the stages of a pycee run with spans, like a tracer would.
+Spans are only recorded once profiling is enabled (by the --profile option),
+otherwise span() hands out a shared span that does nothing, so instrumented code
+costs next to nothing. Spans are written as json lines, or as an OpenTelemetry
+(OTLP/JSON) trace file when the file name ends with .json."""
+import json
+import os
+import threading
+import time
+from typing import Union
+
+SERVICE_NAME = "pycee"
+
+# finished spans while profiling, None when profiling is off
+_spans = None
+_trace_id = None
+_root_span_id = None
+_spans_lock = threading.Lock()
+_local = threading.local()
+
+
+class Span:
+    """A timed stage of a run, to be used as a context manager."""
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = None
+        self.start_time = self.end_time = None
+        self.error = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        global _root_span_id
+
+        stack = _stack()
+        # spans of worker threads hang from the root span
+        self.parent_span_id = stack[-1].span_id if stack else _root_span_id
+        if _root_span_id is None:
+            _root_span_id = self.span_id
+        stack.append(self)
+        self.start_time = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end_time = time.time_ns()
+        _stack().pop()
+        if exc_type is not None and not issubclass(exc_type, SystemExit):
+            self.error = repr(exc_value)
+        with _spans_lock:
+            if _spans is not None:
+                _spans.append(self)
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": _trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_time,
+            "end_time_unix_nano": self.end_time,
+            "duration_ms": (self.end_time - self.start_time) / 1e6,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NullSpan:
+    """Stands for every span while profiling is off."""
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **attributes) -> Union[Span, _NullSpan]:
+    """Time the code within the context as a stage named name."""
+
+    if _spans is None:
+        return _NULL_SPAN
+    return Span(name, attributes)
+
+
+def enabled() -> bool:
+    return _spans is not None
+
+
+def enable():
+    """Start recording spans of a new trace."""
+
+    global _spans, _trace_id, _root_span_id
+
+    _spans, _trace_id, _root_span_id = [], os.urandom(16).hex(), None
+
+
+def disable() -> list:
+    """Stop recording spans.
+    output: the spans recorded, in the order they ended
+    """
+
+    global _spans
+
+    with _spans_lock:
+        spans, _spans = _spans or [], None
+    return spans
+
+
+def write(path: str, spans: list):
+    """Write spans to path as json lines, or as an OTLP/JSON trace file."""
+
+    with open(path, "w") as file:
+        if str(path).endswith(".json"):
+            json.dump(_otlp_trace(spans), file)
+            return
+        for recorded_span in spans:
+            file.write(json.dumps(recorded_span.to_dict()) + "\n")
+
+
+def _otlp_trace(spans: list) -> dict:
+    """Spans in the OTLP/JSON format, which OpenTelemetry tools can import."""
+
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": SERVICE_NAME},
+                        "spans": [
+                            {
+                                "traceId": _trace_id,
+                                "spanId": s.span_id,
+                                "parentSpanId": s.parent_span_id or "",
+                                "name": s.name,
+                                "kind": 1,
+                                "startTimeUnixNano": str(s.start_time),
+                                "endTimeUnixNano": str(s.end_time),
+                                "attributes": [_otlp_attribute(k, v) for k, v in s.attributes.items()],
+                                # status codes: 1 is ok, 2 is error
+                                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+                            }
+                            for s in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+def _otlp_attribute(key: str, value) -> dict:
+
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _stack() -> list:
+    """Spans open on the current thread, innermost last."""
+
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
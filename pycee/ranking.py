@@ -0,0 +1,60 @@
+"""This module ranks answers by how well they match the error of the user, so
+an answer about the exact code that failed can beat a generic one with many more
+votes. The prose and the code of each answer are compared with the error message
+and with the code around the offending line, and that relevance is blended with votes."""
+import html
+import math
+import re
+from typing import List
+
+from .similarity import cosine, inverse_document_frequency, tf_idf, tokenize
+from .utils import Answer
+
+# share of the rank given by relevance, the rest is given by votes
+RELEVANCE_WEIGHT = 0.5
+# lines of the script around the offending line compared with the code of answers
+CONTEXT_LINES = 3
+
+CODE_REGEX = re.compile(r"<code>(.*?)</code>", re.DOTALL)
+TAG_REGEX = re.compile(r"<[^>]+>")
+
+
+def rank_answers(answers: List[Answer], error_info: dict) -> List[Answer]:
+    """Sort answers from the best to the worst match for the error."""
+
+    if len(answers) < 2:
+        return list(answers)
+
+    bodies = [answer.body for answer in answers]
+    texts = [tokenize(html.unescape(TAG_REGEX.sub(" ", body))) for body in bodies]
+    codes = [tokenize(html.unescape(" ".join(CODE_REGEX.findall(body)))) for body in bodies]
+    idf = inverse_document_frequency(texts)
+
+    error_vector = tf_idf(tokenize(_error_text(error_info)), idf)
+    code_vector = tf_idf(tokenize(_code_text(error_info)), idf)
+
+    max_votes = math.log1p(max(max(answer.score, 0) for answer in answers)) or 1
+
+    def rank(i):
+        relevance = (cosine(error_vector, tf_idf(texts[i], idf)) + cosine(code_vector, tf_idf(codes[i], idf))) / 2
+        votes = math.log1p(max(answers[i].score, 0)) / max_votes
+        return RELEVANCE_WEIGHT * relevance + (1 - RELEVANCE_WEIGHT) * votes
+
+    ranks = [rank(i) for i in range(len(answers))]
+    return [answers[i] for i in sorted(range(len(answers)), key=lambda i: ranks[i], reverse=True)]
+
+
+def _error_text(error_info: dict) -> str:
+
+    return " ".join(filter(None, [error_info.get("message"), error_info.get("offending_line")]))
+
+
+def _code_text(error_info: dict) -> str:
+    """Code around the offending line, or only the line itself when
+    the source is not at hand, as in the records of batch runs."""
+
+    code, line = error_info.get("code"), error_info.get("line")
+    if not code or not line:
+        return error_info.get("offending_line") or ""
+
+    return "\n".join(text for _, text in code.context(line, CONTEXT_LINES, CONTEXT_LINES))
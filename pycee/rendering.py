@@ -0,0 +1,89 @@
+"""This module renders answers for the terminal: their html body is converted to
+markdown, which is rendered to ANSI escape sequences. Both are kept in the cache
+under the id and the last edit of each answer, so answers already seen by pycee
+are printed without parsing any html or markdown again."""
+import hashlib
+import io
+
+from .cache import get_cache, MONTH
+from .profiling import span
+
+RENDERED_TTL = MONTH
+
+
+def to_markdown(answer) -> str:
+    """Markdown version of the html body of an answer."""
+
+    key = _rendered_key(answer)
+    rendered = get_cache().get(key)
+
+    if rendered is None:
+        with span("html2text", answer=answer.id):
+            rendered = {"markdown": _html_to_markdown(answer.body), "ansi": None}
+        get_cache().set(key, rendered, RENDERED_TTL)
+
+    return rendered["markdown"]
+
+
+def to_ansi(answer, markdown: str = None) -> str:
+    """Answer body rendered for the terminal. The markdown of the answer, or
+    a summary of it, can be given, otherwise it is taken from the cache or converted.
+    Summaries depend on the error, so they are cached apart from whole answers."""
+
+    key = _rendered_key(answer)
+    rendered = get_cache().get(key)
+
+    if markdown is not None and (rendered is None or markdown != rendered["markdown"]):
+        return _summary_to_ansi(answer, markdown)
+
+    if rendered is None:
+        with span("html2text", answer=answer.id):
+            rendered = {"markdown": _html_to_markdown(answer.body), "ansi": None}
+
+    if rendered["ansi"] is None:
+        with span("consolemd", answer=answer.id, cache_hit=False):
+            rendered["ansi"] = _markdown_to_ansi(rendered["markdown"])
+        get_cache().set(key, rendered, RENDERED_TTL)
+
+    return rendered["ansi"]
+
+
+def _summary_to_ansi(answer, markdown: str) -> str:
+    """Summaries are cached by the answer id and a hash of their markdown."""
+
+    digest = hashlib.blake2b(markdown.encode("utf-8"), digest_size=16).hexdigest()
+    key = f"rendered-summary{(answer.id, digest)!r}"
+    ansi = get_cache().get(key)
+
+    if ansi is None:
+        with span("consolemd", answer=answer.id, cache_hit=False):
+            ansi = _markdown_to_ansi(markdown)
+        get_cache().set(key, ansi, RENDERED_TTL)
+
+    return ansi
+
+
+def _rendered_key(answer) -> str:
+    """Answers change only when edited. Answers without a last edit date,
+    like those of the offline index, are told apart by their (compressed) body instead."""
+
+    version = answer.last_edit
+    if version is None:
+        version = hashlib.blake2b(answer.compressed_body, digest_size=16).hexdigest()
+    return f"rendered{(answer.id, version)!r}"
+
+
+def _html_to_markdown(html: str) -> str:
+
+    from html2text import html2text
+
+    return html2text(html)
+
+
+def _markdown_to_ansi(markdown: str) -> str:
+
+    from consolemd import Renderer
+
+    output = io.StringIO()
+    Renderer().render(markdown, output=output)
+    return output.getvalue()
@@ -0,0 +1,170 @@
+"""This module schedules requests to the StackExchange API so pycee stays within
+its limits, even with many processes sharing the same IP address, as in classrooms.
+Processes share a token bucket, the remaining quota and the backoff of each API
+method through a small state file. When the API can't be used, requests fail with
+ApiUnavailable and pycee falls back to answers it has cached."""
+import json
+import re
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from requests import RequestException
+
+from . import session
+from .cache import cache_dir
+from .locks import file_lock
+from .profiling import span
+
+STATE_FILE_NAME = "api_state.json"
+LOCK_FILE_NAME = "api_state.lock"
+# the API throttles IPs sending more than 30 requests per second
+REQUESTS_PER_SECOND = 20
+BURST = 20
+# requests kept aside from the daily quota
+QUOTA_RESERVE = 10
+# longest time (in seconds) a request may wait for its turn, longer waits give up
+MAX_WAIT = 5
+# API errors worth asking again for later: internal_error, throttle_violation and temporarily_unavailable
+TRANSIENT_ERROR_IDS = (500, 502, 503)
+THROTTLE_ERROR_ID = 502
+# throttle messages tell how long to wait, as in "more requests available in 82866 seconds"
+THROTTLE_WAIT_REGEX = re.compile(r"available in (\d+) seconds")
+
+
+class ApiUnavailable(Exception):
+    """The API can't be used now: quota is exhausted, it asked us to back off,
+    it can't be reached or it returned an error. error_id is the id of API errors."""
+
+    def __init__(self, message: str, error_id: int = None):
+        super().__init__(message)
+        self.error_id = error_id
+
+    def __reduce__(self):
+        # keeps error_id in cached errors
+        return type(self), (str(self), self.error_id)
+
+
+class ApiError(ApiUnavailable):
+    """The API answered with an error response that is not throttling or a temporary failure.
+    Unlike waiting for a backoff or the network coming back, asking again soon is unlikely to help."""
+
+
+def api_get(url: str) -> dict:
+    """Send a GET request to the StackExchange API once it is allowed.
+    output: the json response, which always has a list of items
+    """
+
+    method = api_method(url)
+    with span("api.wait", method=method):
+        _wait_for_turn(method)
+
+    try:
+        response = session.get(url)
+    except RequestException as error:
+        # connection errors, timeouts and server errors left after retrying
+        raise ApiUnavailable(f"the API could not be reached: {error}")
+
+    try:
+        response_json = response.json()
+    except ValueError:
+        raise ApiUnavailable("the API returned an invalid response")
+
+    error_id = response_json.get("error_id")
+    message = response_json.get("error_message", "the API returned no items")
+
+    if error_id == THROTTLE_ERROR_ID and "backoff" not in response_json:
+        wait = THROTTLE_WAIT_REGEX.search(message)
+        if wait:
+            response_json["backoff"] = int(wait.group(1))
+
+    _update_state(method, response_json)
+
+    if error_id in TRANSIENT_ERROR_IDS:
+        raise ApiUnavailable(message, error_id=error_id)
+    if error_id is not None or "items" not in response_json:
+        raise ApiError(message, error_id=error_id)
+
+    return response_json
+
+
+def api_method(url: str) -> str:
+    """Backoffs are given per API method, which is the url path without ids and version.
+    Example:
+    input: "https://api.stackexchange.com/2.2/questions/1;2/answers?site=stackoverflow"
+    output: "/questions/{ids}/answers"
+    """
+
+    parts = urlsplit(url).path.strip("/").split("/")[1:]
+    return "/" + "/".join("{ids}" if part[:1].isdigit() else part for part in parts)
+
+
+def _wait_for_turn(method: str):
+    """Take a token from the shared bucket, honoring backoffs and the quota.
+    Waits up to MAX_WAIT seconds, or raises ApiUnavailable."""
+
+    deadline = time.time() + MAX_WAIT
+
+    while True:
+        with file_lock(cache_dir() / LOCK_FILE_NAME):
+            state = _read_state()
+            now = time.time()
+
+            if _today() == state["quota_day"] and state["quota_remaining"] <= QUOTA_RESERVE:
+                raise ApiUnavailable("the daily API quota is exhausted")
+
+            # refill the bucket for the time elapsed since it was last used
+            tokens = min(BURST, state["tokens"] + (now - state["updated_at"]) * REQUESTS_PER_SECOND)
+            ready_at = max(state["backoff_until"].get(method, 0), now + max(0, 1 - tokens) / REQUESTS_PER_SECOND)
+
+            if ready_at <= now:
+                state.update(tokens=tokens - 1, updated_at=now)
+                _write_state(state)
+                return
+
+        if ready_at > deadline:
+            raise ApiUnavailable(f"the API asked pycee to wait before calling {method} again")
+        time.sleep(ready_at - now)
+
+
+def _update_state(method: str, response_json: dict):
+    """Record the quota and backoff reported by the API."""
+
+    if "quota_remaining" not in response_json and "backoff" not in response_json:
+        return
+
+    with file_lock(cache_dir() / LOCK_FILE_NAME):
+        state = _read_state()
+        if "quota_remaining" in response_json:
+            state.update(quota_remaining=response_json["quota_remaining"], quota_day=_today())
+        if "backoff" in response_json:
+            state["backoff_until"][method] = time.time() + response_json["backoff"]
+        _write_state(state)
+
+
+def _read_state() -> dict:
+
+    state = {"tokens": BURST, "updated_at": 0, "quota_remaining": None, "quota_day": None, "backoff_until": {}}
+
+    try:
+        with open(cache_dir() / STATE_FILE_NAME, "r") as file:
+            state.update(json.load(file))
+    except (OSError, ValueError):
+        # a missing or broken state is replaced by a fresh one
+        pass
+
+    return state
+
+
+def _write_state(state: dict):
+
+    path = cache_dir() / STATE_FILE_NAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(state, file)
+
+
+def _today() -> str:
+    """The API quota resets every day at midnight UTC."""
+
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
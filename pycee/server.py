@@ -0,0 +1,186 @@
+"""This module implements the pycee daemon. A long running server keeps the pipeline
+warm in memory (imports, cache connections and pooled http connections) and diagnoses
+scripts on behalf of thin clients talking to it through a Unix socket.
+
+The protocol is a single json line each way. The client sends the command line arguments,
+its working directory and its environment, and the server replies with the output (stdout and stderr)
+and exit code of the run. Scripts run with the working directory and environment of the client,
+so they find their data files, virtual environment and PYTHONPATH as when run directly."""
+import io
+import json
+import os
+import pathlib
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from typing import Union
+
+from .cache import cache_dir
+
+SOCKET_FILE_NAME = "pycee.sock"
+# seconds a client waits for the daemon to diagnose a script
+CLIENT_TIMEOUT = 120
+
+
+def socket_path() -> pathlib.Path:
+    """The socket can be set through PYCEE_SOCKET,
+    else it is created at the user runtime directory."""
+
+    if os.environ.get("PYCEE_SOCKET"):
+        return pathlib.Path(os.environ["PYCEE_SOCKET"])
+
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    return pathlib.Path(runtime_dir) / SOCKET_FILE_NAME if runtime_dir else cache_dir() / SOCKET_FILE_NAME
+
+
+def forward(argv: list, path=None) -> Union[int, None]:
+    """Ask the daemon to run pycee with the given command line arguments
+    and print its output.
+    output: the exit code of the run, or None if no daemon is running
+    """
+
+    path = str(path or socket_path())
+
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(path):
+        return None
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(CLIENT_TIMEOUT)
+            client.connect(path)
+            request = {"argv": argv, "cwd": os.getcwd(), "env": dict(os.environ)}
+            client.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            response = json.loads(client.makefile("rb").readline())
+    except (OSError, ValueError):
+        # stale socket files and dead daemons make us run in-process
+        return None
+
+    sys.stdout.write(response["output"])
+    sys.stdout.flush()
+    sys.stderr.write(response.get("errors", ""))
+    return response["exit_code"]
+
+
+def serve(path=None):
+    """Run the daemon until interrupted."""
+
+    path = pathlib.Path(path or socket_path())
+
+    if _is_serving(path):
+        print(f"A pycee daemon is already running at {path}")
+        sys.exit(-1)
+    if path.exists():
+        path.unlink()
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    _thread_local_streams()
+    # stopping the daemon with SIGTERM must remove the socket as well
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    with _Server(str(path), _Handler) as server:
+        os.chmod(str(path), 0o600)
+        print(f"pycee daemon listening at {path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            path.unlink()
+
+
+def _is_serving(path) -> bool:
+    """Whether a daemon accepts connections at path."""
+
+    if not path.exists():
+        return False
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(str(path))
+        except OSError:
+            return False
+    return True
+
+
+def handle(argv: list, cwd: str, env: dict = None) -> dict:
+    """Run pycee as if invoked from cwd with argv and the env environment, and capture what it prints."""
+
+    # imported here so clients importing this module don't load the whole pipeline
+    from .pipeline import run
+    from .utils import parse_args
+
+    stdout, stderr = _thread_local_streams()
+    output, errors = io.StringIO(), io.StringIO()
+    stdout.redirect(output)
+    stderr.redirect(errors)
+    exit_code = 0
+
+    try:
+        args = parse_args(argv)
+        args.file_name = os.path.join(cwd, args.file_name)
+        args.cwd, args.env = cwd, env
+        # running scripts in-process swaps stdout, sys.argv and sys.path for the whole daemon
+        args.in_process = False
+        run(args)
+    except SystemExit as exit:
+        exit_code = exit.code if isinstance(exit.code, int) else int(exit.code is not None)
+    except Exception as error:
+        print(f"pycee daemon failed to diagnose the script: {error!r}")
+        exit_code = 1
+    finally:
+        stdout.redirect(None)
+        stderr.redirect(None)
+
+    return {"output": output.getvalue(), "errors": errors.getvalue(), "exit_code": exit_code}
+
+
+def _thread_local_streams() -> tuple:
+    """Runs print to the buffers of the request being handled by their thread,
+    so stdout and stderr are replaced by proxies choosing the streams of the current thread."""
+
+    if not isinstance(sys.stdout, _ThreadLocalStream):
+        sys.stdout = _ThreadLocalStream(sys.stdout)
+    if not isinstance(sys.stderr, _ThreadLocalStream):
+        sys.stderr = _ThreadLocalStream(sys.stderr)
+    return sys.stdout, sys.stderr
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Each client is handled by its own thread."""
+
+    daemon_threads = True
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            response = handle(request["argv"], request["cwd"], request.get("env"))
+        except (ValueError, KeyError):
+            response = {"output": "Invalid request\n", "exit_code": 1}
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class _ThreadLocalStream:
+    """Send writes to the stream set for the current thread, or to the original one."""
+
+    def __init__(self, stream):
+        self._original = stream
+        self._local = threading.local()
+
+    def redirect(self, stream):
+        self._local.stream = stream
+
+    def _stream(self):
+        return getattr(self._local, "stream", None) or self._original
+
+    def write(self, text):
+        return self._stream().write(text)
+
+    def flush(self):
+        return self._stream().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream(), name)
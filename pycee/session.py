@@ -0,0 +1,72 @@
+"""This module keeps a single http session shared by all requests pycee makes.
+Reusing the session keeps connections to each host alive in a pool, so the
+TCP and TLS handshakes are paid once per run instead of once per request."""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .profiling import span
+
+# number of hosts with a connection pool (stackexchange API, google, ...)
+POOL_CONNECTIONS = 4
+# connections kept alive per host, enough for the maximum number of workers
+POOL_MAXSIZE = 10
+# seconds to wait for the server before giving up on a request
+REQUEST_TIMEOUT = 10
+HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "User-Agent": "pycee2",
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Return the shared session, creating it on first use."""
+
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            _session = _new_session()
+
+    return _session
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """Send a GET request through the shared session."""
+
+    kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+    with span("http.get", url=url) as http_span:
+        response = get_session().get(url, **kwargs)
+        http_span.set_attribute("status_code", response.status_code)
+    return response
+
+
+def close_session():
+    """Close the pooled connections, a new session is created on next use."""
+
+    global _session
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def _new_session() -> requests.Session:
+    """Build a session with sized connection pools and retries
+    for connection errors and transient server failures."""
+
+    session = requests.Session()
+    session.headers.update(HEADERS)
+
+    retries = Retry(total=2, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return session
@@ -0,0 +1,45 @@
+"""This module holds the text similarity measures shared by the summarizer and
+the ranking of answers: texts are turned into sparse TF-IDF vectors, as dicts
+mapping each term to its weight, and compared by their cosine similarity."""
+import math
+import re
+from collections import Counter
+from typing import Iterable, List
+
+TOKEN_REGEX = re.compile(r"[a-z_][a-z0-9_]*")
+STOP_WORDS = frozenset(
+    "a an and are as at be but by can do for from has have how i if in is it its not of on or so that the "
+    "then this to was what when which will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Words and identifiers of a text, lowercased and without stop words."""
+
+    return [token for token in TOKEN_REGEX.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def inverse_document_frequency(documents: Iterable[List[str]]) -> dict:
+    """Smoothed idf of each term of the tokenized documents."""
+
+    documents = list(documents)
+    document_frequency = Counter(token for tokens in documents for token in set(tokens))
+    return {token: math.log((1 + len(documents)) / (1 + df)) + 1 for token, df in document_frequency.items()}
+
+
+def tf_idf(tokens: List[str], idf: dict) -> dict:
+    """Sparse tf-idf vector of tokens. Terms missing from idf weigh nothing."""
+
+    return {token: count * idf.get(token, 0) for token, count in Counter(tokens).items()}
+
+
+def cosine(first: dict, second: dict) -> float:
+    """Cosine similarity of two sparse vectors."""
+
+    if len(second) < len(first):
+        first, second = second, first
+
+    dot = sum(weight * second.get(token, 0) for token, weight in first.items())
+    if not dot:
+        return 0.0
+    return dot / math.sqrt(sum(w * w for w in first.values()) * sum(w * w for w in second.values()))
@@ -0,0 +1,118 @@
+"""This module gives access to the lines of source files without reading them
+whole into strings. Files are memory-mapped and the offset of each line is
+indexed once per file content, so getting a line or the lines around it only
+copies those lines, even on large generated modules."""
+import hashlib
+import mmap
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Tuple
+
+# number of line indexes kept in memory, one per distinct file content
+MAX_INDEXES = 128
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+class SourceFile:
+    """Lines of a source file, numbered from 1 like in tracebacks."""
+
+    def __init__(self, path: str):
+        self.path = str(path)
+
+        with open(self.path, "rb") as file:
+            try:
+                self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files cannot be mapped
+                self._data = b""
+
+        self.hash = hashlib.blake2b(self._data, digest_size=16).hexdigest()
+        self._offsets = _line_offsets(self.hash, self._data)
+
+    def __len__(self) -> int:
+        """Number of lines."""
+        return len(self._offsets) - 1
+
+    def __bool__(self) -> bool:
+        return len(self._data) > 0
+
+    def __str__(self) -> str:
+        return self.text()
+
+    def __repr__(self) -> str:
+        return f"SourceFile({self.path!r}, lines={len(self)})"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, SourceFile) and (self.path, self.hash) == (other.path, other.hash)
+
+    def __reduce__(self):
+        # memory maps can't be pickled, the file is mapped again instead
+        return (SourceFile, (self.path,))
+
+    def line(self, number: int) -> str:
+        """The line with the given number, without its line break."""
+
+        if not 1 <= number <= len(self):
+            raise IndexError(f"{self.path} has no line {number}")
+
+        start, end = self._offsets[number - 1], self._offsets[number]
+        return self._data[start:end].decode("utf-8", errors="replace").rstrip("\r\n")
+
+    def offending_line(self, number: int) -> str:
+        """The line where an error happened. Errors reported past
+        the end of the file, like unexpected EOFs, point to the last line."""
+
+        if not self:
+            return None
+        return self.line(number if 1 <= number <= len(self) else len(self))
+
+    def context(self, number: int, before: int = 2, after: int = 2) -> List[Tuple[int, str]]:
+        """The lines around a line, as (line number, line) pairs."""
+
+        first, last = max(1, number - before), min(len(self), number + after)
+        return [(n, self.line(n)) for n in range(first, last + 1)]
+
+    def text(self) -> str:
+        """The whole source, only for those who really need it."""
+
+        return self._data[:].decode("utf-8", errors="replace")
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+
+def get_source(file_path: str) -> SourceFile:
+    """Open a source file for line access."""
+
+    return SourceFile(file_path)
+
+
+def _line_offsets(content_hash: str, data) -> array:
+    """Offsets where each line starts, followed by the size of the data.
+    Indexes are kept by content hash, so unchanged files are indexed only once."""
+
+    with _indexes_lock:
+        if content_hash in _indexes:
+            _indexes.move_to_end(content_hash)
+            return _indexes[content_hash]
+
+    offsets = array("Q", [0])
+    position = data.find(b"\n")
+    while position != -1:
+        offsets.append(position + 1)
+        position = data.find(b"\n", position + 1)
+
+    # a last line without a line break is still a line
+    if offsets[-1] != len(data):
+        offsets.append(len(data))
+
+    with _indexes_lock:
+        _indexes[content_hash] = offsets
+        if len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+
+    return offsets
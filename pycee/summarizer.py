@@ -0,0 +1,136 @@
+"""This module summarizes long answers so they fit on a terminal. Summaries are
+extractive: answers are split into sentences, list items and code blocks, which are
+scored with TF-IDF against the error message and the offending line, and the best
+ones are kept in their original order. Code blocks are never cut, and summarizing
+stops within a fixed time budget, falling back to the beginning of the answers."""
+import re
+import time
+from typing import List
+
+from .similarity import cosine, inverse_document_frequency, tf_idf, tokenize
+
+# answers up to this number of words are left whole
+MAX_WORDS = 200
+# seconds allowed for summarizing each answer
+TIME_BUDGET = 0.02
+# code usually is the fix, so it is favored over prose
+CODE_WEIGHT = 1.5
+# the first units of an answer tend to state the solution, so they are kept too
+LEAD_UNITS = 2
+LEAD_WEIGHT = 0.1
+SUMMARY_NOTE = "_(long answer summarized by pycee)_"
+
+CODE_INDENT = "    "
+LIST_ITEM_REGEX = re.compile(r"^\s*(?:[*+-]|\d+\.)\s")
+SENTENCE_END_REGEX = re.compile(r"(?<=[.!?])\s+(?=[A-Z`*_\[(\"'])")
+
+
+def summarize(markdown: str, error_info: dict) -> str:
+    """Summarize a single answer, see summarize_many."""
+
+    return summarize_many([markdown], error_info)[0]
+
+
+def summarize_many(markdowns: List[str], error_info: dict) -> List[str]:
+    """Summarize answers of the same error at once, so they share the
+    document frequencies of their words. Short answers are returned as they are."""
+
+    deadline = time.perf_counter() + TIME_BUDGET * len(markdowns)
+    summaries = list(markdowns)
+
+    long_answers = {}
+    for i, markdown in enumerate(markdowns):
+        if len(markdown.split()) > MAX_WORDS:
+            long_answers[i] = _split_units(markdown)
+
+    if not long_answers:
+        return summaries
+
+    units = [unit for answer_units in long_answers.values() for unit in answer_units]
+    idf = inverse_document_frequency(unit["tokens"] for unit in units)
+    query = tf_idf(tokenize(_query_text(error_info)), idf)
+
+    for i, answer_units in long_answers.items():
+        if time.perf_counter() < deadline:
+            for position, unit in enumerate(answer_units):
+                unit["score"] = cosine(query, tf_idf(unit["tokens"], idf)) * (
+                    CODE_WEIGHT if unit["kind"] == "code" else 1
+                ) + (LEAD_WEIGHT if position < LEAD_UNITS else 0)
+        else:
+            # out of time, keep the beginning of the answer
+            for position, unit in enumerate(answer_units):
+                unit["score"] = len(answer_units) - position
+
+        summaries[i] = _join_units(_select_units(answer_units)) + "\n\n" + SUMMARY_NOTE + "\n"
+
+    return summaries
+
+
+def _split_units(markdown: str) -> List[dict]:
+    """Split a markdown answer, as converted by html2text, into units: code blocks,
+    list items and sentences. Each unit knows the block it belongs to,
+    so blocks can be put back together."""
+
+    blocks = []
+    for line in markdown.splitlines():
+        is_code = line.startswith(CODE_INDENT) or (not line.strip() and blocks and blocks[-1][0] == "code")
+        if is_code:
+            if not blocks or blocks[-1][0] != "code":
+                blocks.append(("code", []))
+        elif not line.strip():
+            blocks.append(("blank", []))
+            continue
+        elif not blocks or blocks[-1][0] not in ("prose", "list") or LIST_ITEM_REGEX.match(line):
+            blocks.append(("list" if LIST_ITEM_REGEX.match(line) else "prose", []))
+        blocks[-1][1].append(line)
+
+    units = []
+    for block, (kind, lines) in enumerate(blocks):
+        if kind == "code":
+            # only blank lines are trimmed, code lines keep their own indentation
+            while lines and not lines[-1].strip():
+                lines.pop()
+            texts = ["\n".join(lines)] if lines else []
+        elif kind == "list":
+            texts = ["\n".join(lines)]
+        elif kind == "prose":
+            texts = SENTENCE_END_REGEX.split(" ".join(line.strip() for line in lines))
+        else:
+            texts = []
+        units.extend(
+            {"block": block, "kind": kind, "text": text, "words": len(text.split()), "tokens": tokenize(text)}
+            for text in texts
+        )
+
+    return units
+
+
+def _select_units(units: List[dict]) -> List[dict]:
+    """Keep the best scored units within MAX_WORDS, at least one, in their original order.
+    Units unrelated to the error are left out even when there is room for them."""
+
+    selected, words = [], 0
+    for i in sorted(range(len(units)), key=lambda i: units[i]["score"], reverse=True):
+        if not selected or (units[i]["score"] > 0 and words + units[i]["words"] <= MAX_WORDS):
+            selected.append(i)
+            words += units[i]["words"]
+
+    return [units[i] for i in sorted(selected)]
+
+
+def _join_units(units: List[dict]) -> str:
+
+    blocks = {}
+    for unit in units:
+        blocks.setdefault(unit["block"], []).append(unit)
+
+    return "\n\n".join(
+        (" " if block_units[0]["kind"] == "prose" else "\n").join(unit["text"] for unit in block_units)
+        for block_units in blocks.values()
+    )
+
+
+def _query_text(error_info: dict) -> str:
+    """The summary is about the error and the line that raised it."""
+
+    return " ".join(filter(None, [error_info.get("message"), error_info.get("offending_line")]))
@@ -5,8 +5,7 @@ import glob
 import os
 import pathlib
 import sys
-
-from consolemd import Renderer
+import zlib
 
 
 def parse_args(args=sys.argv[1:]):
@@ -36,6 +35,15 @@ def parse_args(args=sys.argv[1:]):
         dest="n_answers",
         help="Number of answers to display",
     )
+    parser.add_argument(
+        "-w",
+        metavar="--workers",
+        type=int,
+        choices=range(1, 11),
+        default=1,
+        dest="workers",
+        help="Number of concurrent requests used to retrieve answers",
+    )
     parser.add_argument(
         "-g",
         "--from-google-search",
@@ -60,6 +68,35 @@ def parse_args(args=sys.argv[1:]):
         default=True,
         help="Output only pycee hint for the error",
     )
+    parser.add_argument(
+        "-i",
+        "--in-process",
+        dest="in_process",
+        action="store_true",
+        default=False,
+        help="Run the script inside pycee instead of a separate python process, the daemon always uses one",
+    )
+    parser.add_argument(
+        "--stream",
+        dest="stream",
+        action="store_true",
+        default=False,
+        help="Print the pycee hint first and each answer as soon as it arrives",
+    )
+    parser.add_argument(
+        "--full-answers",
+        dest="summarize",
+        action="store_false",
+        default=True,
+        help="Print long answers whole instead of summarizing them",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        dest="profile",
+        default=None,
+        help="Write the time spent on each stage to FILE, as json lines or as an OpenTelemetry trace if FILE ends with .json",
+    )
     parser.add_argument(
         "-d",
         "--dry-run",
@@ -75,6 +112,21 @@ def parse_args(args=sys.argv[1:]):
         default=False,
         help="Remove all local cache files",
     )
+    parser.add_argument(
+        "-o",
+        "--offline",
+        dest="offline",
+        action="store_true",
+        default=False,
+        help="Retrieve questions and answers only from the offline index",
+    )
+    parser.add_argument(
+        "--no-daemon",
+        dest="use_daemon",
+        action="store_false",
+        default=True,
+        help="Diagnose the script in this process even if a pycee daemon is running",
+    )
     parser.add_argument(
         "-f",
         "--no-cache",
@@ -83,39 +135,180 @@ def parse_args(args=sys.argv[1:]):
         default=True,
         help="Force API requests by skipping any local caches",
     )
+    # working directory and environment of the script, set by the daemon to those of its client
+    parser.set_defaults(cwd=None, env=None)
+
+    return parser.parse_args(args)
+
+
+def parse_cache_args(args=sys.argv[2:]):
+    """Argparse for the 'pycee cache' command, which manages the local cache."""
+
+    parser = argparse.ArgumentParser("pycee2 cache", description="Manage the local cache of questions and answers.")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    subparsers.required = True
+
+    export_parser = subparsers.add_parser("export", help="Write the cache to a compressed bundle file")
+    export_parser.add_argument("bundle", type=str, help="Path of the bundle file to write")
+
+    import_parser = subparsers.add_parser("import", help="Load a bundle file into the cache")
+    import_parser.add_argument("bundle", type=str, help="Path of the bundle file to read")
+
+    warm_parser = subparsers.add_parser("warm", help="Cache the answers for common errors ahead of time")
+    warm_parser.add_argument(
+        "--corpus",
+        type=str,
+        default=None,
+        help="Path of a file with an error message per line, by default the corpus shipped with pycee",
+    )
+    warm_parser.add_argument(
+        "-j",
+        metavar="--jobs",
+        type=int,
+        default=4,
+        dest="jobs",
+        help="Number of errors looked up in parallel",
+    )
+    warm_parser.add_argument(
+        "-q",
+        metavar="--n-questions",
+        type=int,
+        choices=range(1, 6),
+        dest="n_questions",
+        help="Number of questions to retrieve from Stackoverflow, as used by the runs to be warmed",
+    )
+    # other options keep the defaults of a regular pycee run, which the cache keys depend on
+    warm_parser.set_defaults(**vars(parse_args(["<warm>"])))
+
+    return parser.parse_args(args)
+
+
+def parse_index_args(args=sys.argv[2:]):
+    """Argparse for the 'pycee index' command, which manages the offline index."""
+
+    parser = argparse.ArgumentParser("pycee2 index", description="Manage the offline index of questions and answers.")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    subparsers.required = True
+
+    import_parser = subparsers.add_parser("import", help="Import python questions from a StackOverflow Posts.xml dump")
+    import_parser.add_argument("dump", type=str, help="Path to the Posts.xml file of the data dump")
+
+    return parser.parse_args(args)
+
+
+def parse_serve_args(args=sys.argv[2:]):
+    """Argparse for the 'pycee serve' command, which runs the pycee daemon."""
+
+    parser = argparse.ArgumentParser("pycee2 serve", description="Run a pycee daemon that keeps answers warm.")
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=None,
+        help="Path of the Unix socket to listen on, clients find it through the PYCEE_SOCKET variable",
+    )
+
+    return parser.parse_args(args)
+
+
+def parse_batch_args(args=sys.argv[2:]):
+    """Argparse for the 'pycee batch' command, which diagnoses many scripts at once.
+    Options not set by this command keep the defaults of a regular pycee run."""
+
+    parser = argparse.ArgumentParser("pycee2 batch", description="Diagnose many scripts in a single run.")
+    parser.add_argument(
+        "source",
+        type=str,
+        help="A directory of scripts, or a jsonl file with a 'file' and an optional 'traceback' per line",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="-",
+        help="Path of the jsonl file to write results to, by default results go to the standard output",
+    )
+    parser.add_argument(
+        "-j",
+        metavar="--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        dest="jobs",
+        help="Number of scripts diagnosed in parallel, by default the number of CPUs",
+    )
+    parser.add_argument(
+        "-q",
+        metavar="--n-questions",
+        type=int,
+        choices=range(1, 6),
+        dest="n_questions",
+        help="Number of questions to retrieve from Stackoverflow",
+    )
+    parser.add_argument(
+        "-a",
+        metavar="--n-answers",
+        type=int,
+        choices=range(1, 5),
+        dest="n_answers",
+        help="Number of answers for each script",
+    )
+    parser.add_argument(
+        "-i",
+        "--in-process",
+        dest="in_process",
+        action="store_true",
+        help="Run scripts inside the worker processes instead of separate python processes",
+    )
+    parser.add_argument(
+        "-o",
+        "--offline",
+        dest="offline",
+        action="store_true",
+        help="Retrieve questions and answers only from the offline index",
+    )
+    parser.add_argument(
+        "-f",
+        "--no-cache",
+        dest="cache",
+        action="store_false",
+        help="Force API requests by skipping any local caches",
+    )
+    parser.set_defaults(**vars(parse_args(["<batch>"])))
 
     return parser.parse_args(args)
 
 
 def remove_cache():
-    """Util to remove the cache files, which can be located at two different places
-    depending if pycee is running as a installed package or as a cloned repository"""
+    """Util to remove all cached questions and answers. Cache files left by older
+    pycee versions, located next to the package or at a cloned repository, are removed too."""
+
+    from .cache import get_cache, remove_key_locks
+
+    get_cache().clear()
+    remove_key_locks()
 
     installed_module_path = pathlib.Path(__file__).parent.absolute()
     package_cache = glob.glob(os.path.join(installed_module_path, "*.cache*"))
     local_cache = glob.glob("pycee/*.cache*")
-    files = package_cache + local_cache
-    print("Cache removed!\nPlease run pycee again without -rm or --remove-cache argument to get your answers")
-    # excecvp replace the current process
-    # This is currently necessary because filecache package
-    # wouldn't let me delete all cache files on the main process
-    # -f so not found files won't polute the terminal
-    os.execvp("rm", ["rm", "-f"] + files)
-    # after execv vp finishes executing rm it exits
+    for file in package_cache + local_cache:
+        os.remove(file)
+
+    print("Cache removed!\n")
 
 
 def print_answers(so_answers, pycee_hint, pydoc_answer, args):
-    """ Hide the logic of printing answers from the usage example """
+    """ Hide the logic of printing answers from the usage example.
+    so_answers are (markdown, answer) pairs, rendered for the terminal as they are printed """
 
     if args.show_so_answer:
 
         if not so_answers:
             print("Pycee couldn't find answers for the error on Stackoverflow.\n")
         else:
-            renderer = Renderer()
-            for i, answer in enumerate(so_answers):
+            # answers already rendered once are printed from the cache
+            from .rendering import to_ansi
+
+            for i, (markdown, answer) in enumerate(so_answers):
                 print(f"Solution {i+1}:\n")
-                renderer.render(answer)
+                print(to_ansi(answer, markdown), end="")
                 print("\n")
 
     if args.show_pycee_hint:
@@ -126,6 +319,40 @@ def print_answers(so_answers, pycee_hint, pydoc_answer, args):
             print(pycee_hint)
 
 
+def print_answers_stream(answer_stream, pycee_hint, pydoc_answer, args):
+    """Print the pycee hint right away, then each answer as soon as it arrives.
+    Once all answers are in, a footer tells their order by votes."""
+
+    if args.show_pycee_hint:
+        print("Pycee hint:\n")
+        if not pycee_hint:
+            print("Pycee does not have an hint for fixing this error on its manuals.")
+        else:
+            print(pycee_hint)
+        print("\n")
+
+    if not args.show_so_answer:
+        return
+
+    from .rendering import to_ansi
+
+    scores = []
+
+    for markdown, answer in answer_stream:
+        print(f"Solution {len(scores)+1} ({answer.score} votes):\n")
+        print(to_ansi(answer, markdown), end="")
+        print("\n", flush=True)
+        scores.append(answer.score)
+        if len(scores) == args.n_answers:
+            break
+
+    if not scores:
+        print("Pycee couldn't find answers for the error on Stackoverflow.\n")
+    elif scores != sorted(scores, reverse=True):
+        by_votes = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        print("Solutions sorted by votes: " + ", ".join(str(i + 1) for i in by_votes))
+
+
 # These are some constants we use throughout the codebase
 SINGLE_QUOTE_CHAR = "'"
 DOUBLE_QUOTE_CHAR = '"'
@@ -133,16 +360,68 @@ SINGLE_SPACE_CHAR = " "
 EMPTY_STRING = ""
 COMMA_CHAR = ","
 
+# error messages the cache is warmed with by 'pycee cache warm'
+COMMON_ERRORS_FILE = pathlib.Path(__file__).parent / "data" / "common_errors.txt"
+
 BASE_URL = "https://api.stackexchange.com/2.2"
 SEARCH_URL = BASE_URL + "/search?site=stackoverflow"
 ANSWERS_URL = BASE_URL + "/questions/<id>/answers?site=stackoverflow" + "&filter=withbody" + "&order=desc" + "&sort=votes"
+# limits of the stackexchange API for a single request
+MAX_IDS_PER_REQUEST = 100
+MAX_PAGESIZE = 100
 
 # A list of all standard exeptions
 BUILTINS = dir(sys.modules["builtins"])
 
 # namedtuples to represent simple objects
 Question = namedtuple("Question", ["id", "has_accepted"])
-Answer = namedtuple("Answer", ["id", "accepted", "score", "body", "author", "profile_image"])
+
+
+class Answer:
+    """An answer of a question. Bodies take most of the memory and cache space of answers,
+    so they are kept zlib-compressed and only decompressed when body is read, to be rendered.
+    last_edit is the timestamp of the last edit of the answer, if known."""
+
+    __slots__ = ("id", "accepted", "score", "compressed_body", "author", "profile_image", "last_edit")
+
+    def __new__(cls, id, accepted, score, body, author, profile_image, last_edit=None):
+        # answers pickled as namedtuples by older versions are built through __new__ too
+        return _answer_from_compressed(
+            id, accepted, score, zlib.compress(body.encode("utf-8")), author, profile_image, last_edit
+        )
+
+    @property
+    def body(self) -> str:
+        return zlib.decompress(self.compressed_body).decode("utf-8")
+
+    def _fields(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __reduce__(self):
+        # pickled with the compressed body, so the cache stores it compressed as well
+        return _answer_from_compressed, self._fields()
+
+    def __eq__(self, other):
+        if not isinstance(other, Answer):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __hash__(self):
+        return hash(self._fields())
+
+    def __repr__(self):
+        return f"Answer(id={self.id!r}, accepted={self.accepted!r}, score={self.score!r}, author={self.author!r})"
+
+
+def _answer_from_compressed(id, accepted, score, compressed_body, author, profile_image, last_edit) -> Answer:
+
+    answer = object.__new__(Answer)
+    answer.id, answer.accepted, answer.score = id, accepted, score
+    answer.compressed_body, answer.author = compressed_body, author
+    answer.profile_image, answer.last_edit = profile_image, last_edit
+    return answer
+
+
 HINT_MESSAGES = {
     "KeyError": (
         "<initial_error>\n\nKeyError exceptions are raised to the user when a key is not found in a dictionary."
@@ -0,0 +1,79 @@
+"""This module fills the cache ahead of time with the answers for common errors,
+so runs on warmed machines (like a lab, the night before a class) don't need the
+network. Queries are built from a corpus of error messages by the same handlers
+used on real errors, so they match the cache keys of real runs."""
+from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from .answers import ask_cache
+from .errors import handle_error
+from .inspection import get_error_type
+from .rendering import to_ansi
+from .scheduler import ApiUnavailable
+from .utils import COMMON_ERRORS_FILE
+
+
+def load_corpus(path=None) -> List[str]:
+    """Error messages of a corpus file, one per line, skipping blank lines and # comments."""
+
+    with open(path or COMMON_ERRORS_FILE, "r", encoding="utf-8") as corpus:
+        return [line.strip() for line in corpus if line.strip() and not line.lstrip().startswith("#")]
+
+
+def error_info_for(message: str) -> dict:
+    """Error information as inspection would give for a script raising
+    the error, except for what only the script itself can tell."""
+
+    return {
+        "traceback": message,
+        "message": message,
+        "type": get_error_type(message),
+        "line": 1,
+        "file": None,
+        "code": None,
+        "offending_line": "",
+    }
+
+
+def warm_cache(messages: List[str], cmd_args: Namespace) -> dict:
+    """Retrieve and cache the answers of each distinct error query, in parallel.
+    Requests go through the API scheduler, so warming stays within the quota:
+    once it is exhausted, the remaining queries fail without touching the network.
+    output: some counts about the warm-up
+    """
+
+    lookups = {}
+    for message in messages:
+        error_info = error_info_for(message)
+        query, _, _ = handle_error(error_info, cmd_args)
+        # errors without a query are searched on google by their message
+        lookups.setdefault(query or ("google", message), (query, error_info))
+
+    with ThreadPoolExecutor(max_workers=cmd_args.jobs) as executor:
+        results = list(executor.map(lambda lookup: _warm_query(*lookup, cmd_args), lookups.values()))
+
+    return {
+        "messages": len(messages),
+        "queries": len(lookups),
+        "answered": results.count("answered"),
+        "unanswered": results.count("unanswered"),
+        "failed": results.count("failed"),
+    }
+
+
+def _warm_query(query, error_info: dict, cmd_args: Namespace) -> str:
+    """Run the cached lookups of a query like a regular run would, and render its answers."""
+
+    try:
+        _, answers = ask_cache(query, error_info, cmd_args)
+    except ApiUnavailable:
+        return "failed"
+    except Exception:
+        # google blocking its scraping doesn't stop the other queries
+        return "failed"
+
+    for answer in answers:
+        to_ansi(answer)
+
+    return "answered" if answers else "unanswered"
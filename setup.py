@@ -83,7 +83,8 @@ setup(
     author_email=AUTHOR_EMAIL,
     maintainer=MAINTAINER,
     maintainer_email=MAINTAINER_EMAIL,
-    packages=find_packages(exclude=("tests",)),
+    packages=find_packages(exclude=("tests", "benchmarks")),
+    package_data={"pycee": ["data/*.txt"]},
     # py_modules=["pycee"],
     install_requires=required,
     scripts=["usage.py"],
@@ -0,0 +1,11 @@
+import pytest
+
+from pycee import cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_dirs_fixture(tmp_path, monkeypatch):
+    """ Keep files written by pycee (cache, api state, index) out of the user directories """
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg_cache"))
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "xdg_data"))
+    monkeypatch.setattr(cache, "_cache", None)
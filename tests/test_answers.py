@@ -1,8 +1,12 @@
+from collections import namedtuple
+import pickle
+
 from httmock import all_requests, HTTMock
 import googlesearch
 
-from pycee.answers import _ask_stackoverflow, _ask_google, _get_answer_content
-from pycee.utils import Question, Answer
+from pycee import utils
+from pycee.answers import _ask_stackoverflow, _ask_google, _get_answer_content, ask_cache, iter_answers
+from pycee.utils import Question, Answer, parse_args
 
 
 # data resources
@@ -142,3 +146,156 @@ def test_get_answer_content_handle_empty_response():
     with HTTMock(empty_answers_response):
         questions = _get_answer_content(question_obj)
     assert questions == tuple([])
+
+
+def test_get_answer_content_fetches_all_questions_in_one_request():
+
+    question_obj = tuple([Question(id="1", has_accepted=True), Question(id="2", has_accepted=False)])
+    answers_data_two_questions = {
+        "items": answers_data["items"]
+        + [
+            {
+                "is_accepted": False,
+                "score": 7,
+                "answer_id": 6,
+                "question_id": "2",
+                "body": "Body 6",
+                "owner": {"display_name": "author 6"},
+            }
+        ]
+    }
+    requested_urls = []
+
+    @all_requests
+    def two_questions_response(url, request):
+        requested_urls.append(request.url)
+        return {"status_code": 200, "content": answers_data_two_questions}
+
+    with HTTMock(two_questions_response):
+        answers = _get_answer_content(question_obj)
+
+    assert len(requested_urls) == 1
+    assert "/questions/1;2/answers" in requested_urls[0]
+    assert [a.id for a in answers] == ["4", "3", "6"]
+
+
+def test_get_answer_content_follows_pagination():
+
+    question_obj = tuple([Question(id="1", has_accepted=True)])
+    pages = {
+        "1": {"items": answers_data["items"][:1], "has_more": True},
+        "2": {"items": answers_data["items"][1:], "has_more": False},
+    }
+
+    @all_requests
+    def paginated_response(url, request):
+        page = url.query.split("page=")[-1]
+        return {"status_code": 200, "content": pages[page]}
+
+    with HTTMock(paginated_response):
+        answers = _get_answer_content(question_obj)
+
+    assert [a.id for a in answers] == ["4", "3"]
+
+
+def test_get_answer_content_splits_questions_among_workers():
+
+    question_obj = tuple([Question(id="1", has_accepted=True), Question(id="2", has_accepted=False)])
+    requested_urls = []
+
+    @all_requests
+    def per_question_response(url, request):
+        requested_urls.append(request.url)
+        question_id = url.path.split("/")[-2]
+        items = [dict(item, question_id=question_id) for item in answers_data["items"][:1]]
+        return {"status_code": 200, "content": {"items": items}}
+
+    with HTTMock(per_question_response):
+        answers = _get_answer_content(question_obj, workers=2)
+
+    assert len(requested_urls) == 2
+    assert len(answers) == 2
+
+
+def test_iter_answers_requests_each_question_separately():
+
+    requested_urls = []
+
+    @all_requests
+    def api_response(url, request):
+        requested_urls.append(request.url)
+        if "/search" in url.path:
+            content = {"items": [{"is_answered": True, "question_id": qid} for qid in ("1", "2")]}
+        else:
+            question_id = url.path.split("/")[-2]
+            content = {"items": [dict(item, question_id=question_id) for item in answers_data["items"][:1]]}
+        return {"status_code": 200, "content": content}
+
+    cmd_args = parse_args(["foo.py", "-f", "-w", "2"])
+    with HTTMock(api_response):
+        answers = list(iter_answers("https://api.stackexchange.com/2.2/search?q", {"message": ""}, cmd_args))
+
+    assert len(requested_urls) == 3
+    assert [markdown for markdown, _ in answers] == ["Body 4\n\n", "Body 4\n\n"]
+
+
+def test_iter_answers_shares_the_cache_of_regular_runs():
+
+    requested_urls = []
+
+    @all_requests
+    def api_response(url, request):
+        requested_urls.append(request.url)
+        if "/search" in url.path:
+            content = {"items": [{"is_answered": True, "question_id": qid} for qid in ("1", "2")]}
+        else:
+            question_ids = url.path.split("/")[-2].split(";")
+            content = {"items": [dict(answers_data["items"][0], question_id=qid) for qid in question_ids]}
+        return {"status_code": 200, "content": content}
+
+    query, error_info = "https://api.stackexchange.com/2.2/search?q", {"message": ""}
+    with HTTMock(api_response):
+        streamed = list(iter_answers(query, error_info, parse_args(["foo.py", "-w", "2"])))
+        requests_of_stream = len(requested_urls)
+        _, answers = ask_cache(query, error_info, parse_args(["foo.py"]))
+        streamed_again = list(iter_answers(query, error_info, parse_args(["foo.py"])))
+
+    assert requests_of_stream == 3
+    assert len(requested_urls) == 3
+    assert len(answers) == len(streamed) == len(streamed_again) == 2
+
+
+def test_answer_keeps_its_body_compressed():
+
+    body = "<p>Use <code>dict.get()</code> to read keys that may be missing.</p>\n" * 50
+    answer = Answer(id="1", accepted=True, score=3, body=body, author="author", profile_image=None)
+
+    assert answer.body == body
+    assert len(answer.compressed_body) * 5 < len(body)
+    assert not hasattr(answer, "__dict__")
+
+
+def test_answer_pickles_its_compressed_body():
+
+    answer = Answer(id="1", accepted=True, score=3, body="<p>Body</p>", author="author", profile_image=None)
+
+    unpickled = pickle.loads(pickle.dumps(answer, protocol=pickle.HIGHEST_PROTOCOL))
+
+    assert unpickled == answer
+    assert unpickled.body == "<p>Body</p>"
+    assert answer.compressed_body in pickle.dumps(answer)
+
+
+def test_answer_unpickles_answers_of_older_versions(monkeypatch):
+    """Answers used to be namedtuples, pickled as the arguments of Answer.__new__"""
+
+    legacy_answer = namedtuple("Answer", ["id", "accepted", "score", "body", "author", "profile_image"])
+    legacy_answer.__module__ = "pycee.utils"
+    with monkeypatch.context() as patch:
+        patch.setattr(utils, "Answer", legacy_answer)
+        pickled = pickle.dumps(legacy_answer("1", True, 3, "<p>Body</p>", "author", None))
+
+    answer = pickle.loads(pickled)
+
+    assert answer == Answer(id="1", accepted=True, score=3, body="<p>Body</p>", author="author", profile_image=None)
+    assert answer.last_edit is None
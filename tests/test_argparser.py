@@ -1,6 +1,6 @@
 from argparse import Namespace
 import pytest
-from pycee.utils import parse_args
+from pycee.utils import parse_args, parse_batch_args, parse_cache_args, parse_index_args
 
 
 def test_missing_filename_raises_sys_exit():
@@ -49,6 +49,13 @@ def test_default_args():
         file_name="foo.py",  # not an default arg, actually
         n_answers=3,
         n_questions=3,
+        workers=1,
+        offline=False,
+        use_daemon=True,
+        in_process=False,
+        stream=False,
+        summarize=True,
+        profile=None,
         cache=True,
         dry_run=False,
         rm_cache=False,
@@ -61,9 +68,39 @@ def test_default_args():
     assert parsed_args.file_name == expected_args.file_name
     assert parsed_args.n_answers == expected_args.n_answers
     assert parsed_args.n_questions == expected_args.n_questions
+    assert parsed_args.workers == expected_args.workers
+    assert parsed_args.offline == expected_args.offline
+    assert parsed_args.use_daemon == expected_args.use_daemon
+    assert parsed_args.in_process == expected_args.in_process
+    assert parsed_args.stream == expected_args.stream
+    assert parsed_args.summarize == expected_args.summarize
+    assert parsed_args.profile == expected_args.profile
     assert parsed_args.cache == expected_args.cache
     assert parsed_args.dry_run == expected_args.dry_run
     assert parsed_args.rm_cache == expected_args.rm_cache
     assert parsed_args.google_search_only == expected_args.google_search_only
     assert parsed_args.show_pycee_hint == expected_args.show_pycee_hint
     assert parsed_args.show_so_answer == expected_args.show_so_answer
+
+
+def test_cache_command_requires_a_subcommand():
+    with pytest.raises(SystemExit):
+        parse_cache_args([])
+
+
+def test_cache_export_and_import_args():
+    assert parse_cache_args(["export", "bundle.gz"]) == Namespace(command="export", bundle="bundle.gz")
+    assert parse_cache_args(["import", "bundle.gz"]) == Namespace(command="import", bundle="bundle.gz")
+
+
+def test_index_import_args():
+    assert parse_index_args(["import", "Posts.xml"]) == Namespace(command="import", dump="Posts.xml")
+
+
+def test_batch_args_keep_the_defaults_of_a_regular_run():
+    args = parse_batch_args(["scripts/", "-j", "4", "-q", "5"])
+    assert args.source == "scripts/"
+    assert args.jobs == 4
+    assert args.n_questions == 5
+    assert args.n_answers == parse_args(["foo.py"]).n_answers
+    assert args.dry_run is False
@@ -0,0 +1,106 @@
+import json
+
+import pytest
+import requests
+from httmock import all_requests, HTTMock
+
+from pycee import batch
+from pycee.utils import parse_batch_args
+
+
+@pytest.fixture()
+def scripts_fixture(tmpdir):
+    """ A directory of scripts, two of them with the same error """
+    scripts = tmpdir.mkdir("scripts")
+    scripts.join("a.py").write("x = [1]\nprint(x[3])\n")
+    scripts.join("b.py").write("y = [2]\ny[9]\n")
+    scripts.join("c.py").write("import not_a_module\n")
+    scripts.join("ok.py").write("print('no errors here')\n")
+    scripts.join("notes.txt").write("not a script")
+    return scripts
+
+
+def test_iter_tasks_from_directory(scripts_fixture):
+
+    files = [task["file"] for task in batch.iter_tasks(str(scripts_fixture))]
+    assert files == [str(scripts_fixture.join(name)) for name in ["a.py", "b.py", "c.py", "ok.py"]]
+
+
+def test_iter_tasks_from_jsonl(tmpdir):
+
+    jsonl = tmpdir.join("tracebacks.jsonl")
+    jsonl.write('{"file": "a.py", "traceback": "IndexError"}\n\n{"file": "b.py"}\n')
+    assert list(batch.iter_tasks(str(jsonl))) == [{"file": "a.py", "traceback": "IndexError"}, {"file": "b.py"}]
+
+
+def test_diagnose_with_traceback(scripts_fixture):
+
+    traceback = f'Traceback (most recent call last):\n  File "{scripts_fixture.join("a.py")}", line 2, in <module>\nIndexError: list index out of range\n'
+    task = {"id": 1, "file": str(scripts_fixture.join("a.py")), "traceback": traceback}
+    record = batch.diagnose(task, parse_batch_args(["-"]))
+
+    assert record["id"] == 1
+    assert record["status"] == "error"
+    assert record["offending_line"] == "print(x[3])"
+    assert "intitle=indexerror+list+index+out+of+range" in record["query"]
+
+
+def test_run_batch_looks_up_each_distinct_error_once(scripts_fixture, tmpdir, monkeypatch):
+
+    looked_up = []
+
+    def mock_get_record_answers(record, cmd_args):
+        looked_up.append(record["query"])
+        return [{"id": "1", "markdown": "answer"}]
+
+    monkeypatch.setattr(batch, "get_record_answers", mock_get_record_answers)
+    output = tmpdir.join("results.jsonl")
+    counts = batch.run_batch(str(scripts_fixture), str(output), parse_batch_args(["-", "-j", "2"]))
+
+    assert counts == {"scripts": 4, "errors": 3, "distinct_errors": 2}
+    assert len(looked_up) == 2
+    records = [json.loads(line) for line in output.readlines()]
+    assert [record["status"] for record in records] == ["error", "error", "error", "no_error"]
+    assert records[0]["answers"] == records[1]["answers"] == [{"id": "1", "markdown": "answer"}]
+
+
+def test_diagnose_records_invalid_tasks():
+
+    assert batch.diagnose({"traceback": "IndexError"}, parse_batch_args(["-"]))["status"] == "failed"
+    assert batch.diagnose("not json", parse_batch_args(["-"]))["reason"] == "invalid task: 'not json'"
+
+
+def test_run_batch_records_failed_lookups(scripts_fixture, tmpdir, monkeypatch):
+
+    def mock_get_record_answers(record, cmd_args):
+        if record["type"] == "ModuleNotFoundError":
+            raise ConnectionError("google said 429")
+        return [{"id": "1", "markdown": "answer"}]
+
+    monkeypatch.setattr(batch, "get_record_answers", mock_get_record_answers)
+    output = tmpdir.join("results.jsonl")
+    counts = batch.run_batch(str(scripts_fixture), str(output), parse_batch_args(["-", "-j", "2"]))
+
+    assert counts == {"scripts": 4, "errors": 3, "distinct_errors": 2}
+    records = [json.loads(line) for line in output.readlines()]
+    assert [record["status"] for record in records] == ["error", "error", "failed", "no_error"]
+    assert "google said 429" in records[2]["reason"]
+
+
+def test_run_batch_records_lookups_failing_on_the_api(scripts_fixture, tmpdir, capsys):
+
+    @all_requests
+    def unreachable(url, request):
+        raise requests.ConnectionError("network is down")
+
+    scripts = tmpdir.mkdir("index_errors")
+    for name in ("a.py", "b.py"):
+        scripts_fixture.join(name).copy(scripts.join(name))
+    output = tmpdir.join("results.jsonl")
+    with HTTMock(unreachable):
+        batch.run_batch(str(scripts), str(output), parse_batch_args(["-", "-j", "1"]))
+
+    records = [json.loads(line) for line in output.readlines()]
+    assert [record["status"] for record in records] == ["failed", "failed"]
+    assert "network is down" in records[0]["reason"]
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,45 @@
+from benchmarks.run import SCRIPTS_DIR, compare, fresh_cache, load_fixtures, playback, same_machine, time_run
+
+
+def make_results(seconds):
+    return {"scripts": {"index_error": {"cold": {"total": seconds, "stages": {"rank": seconds / 10}}}}}
+
+
+def test_compare_reports_regressions_only():
+
+    assert compare(make_results(0.2), make_results(0.1), tolerance=0.5) == [
+        ("index_error.cold.stages.rank", 0.02, 0.01),
+        ("index_error.cold.total", 0.2, 0.1),
+    ]
+    assert compare(make_results(0.1), make_results(0.2), tolerance=0.5) == []
+    # a few milliseconds are noise, whatever the ratio
+    assert compare(make_results(0.003), make_results(0.001), tolerance=0.5) == []
+
+
+def test_runs_are_timed_offline_by_stage():
+
+    with playback(load_fixtures()), fresh_cache():
+        cold = time_run(SCRIPTS_DIR / "index_error.py")
+        warm = time_run(SCRIPTS_DIR / "index_error.py")
+
+    assert {"inspect", "handle", "search", "answers", "rank", "render"} <= set(cold["stages"])
+    assert cold["total"] >= sum(cold["stages"].values())
+    assert warm["stages"]["answers"] < cold["stages"]["answers"]
+
+
+def test_baselines_of_other_machines_are_advisory():
+
+    results = dict(make_results(0.2), python="3.11.7", platform="Linux")
+    assert same_machine(results, dict(make_results(0.1), python="3.11.7", platform="Linux"))
+    assert not same_machine(results, dict(make_results(0.1), python="3.8.10", platform="Linux"))
+    assert not same_machine(results, dict(make_results(0.1), python="3.11.7", platform="macOS"))
+
+
+def test_fixtures_answer_each_script_with_its_own_questions():
+
+    fixtures = load_fixtures()
+    searches = [content for url, content in fixtures["stackexchange"].items() if "/search?" in url]
+
+    assert len(searches) >= 10
+    question_ids = [tuple(item["question_id"] for item in content["items"]) for content in searches]
+    assert len(set(question_ids)) == len(question_ids)
@@ -0,0 +1,369 @@
+import gzip
+import json
+import pathlib
+import sqlite3
+import threading
+import time
+from multiprocessing import Pool
+
+import pytest
+
+from pycee import cache as cache_module
+from pycee.cache import MAX_STALENESS, REFRESH_EXIT_WAIT, Cache, cache_dir, cached, export_bundle, import_bundle
+from pycee.cache import key_lock, remove_key_locks, wait_for_refreshes
+from pycee.utils import Answer, Question
+
+
+@pytest.fixture()
+def cache_fixture(tmp_path):
+    """ A cache stored at a temporary directory """
+    cache = Cache(tmp_path / "cache.sqlite3")
+    yield cache
+    cache.close()
+
+
+@pytest.fixture()
+def shared_cache_fixture(cache_fixture, monkeypatch):
+    """ Make the temporary cache the one used by the cached decorator """
+    monkeypatch.setattr(cache_module, "_cache", cache_fixture)
+    return cache_fixture
+
+
+def _set_many(args):
+    path, worker = args
+    cache = Cache(path)
+    for i in range(20):
+        cache.set(f"{worker}-{i}", i)
+    return [cache.get(f"{worker}-{i}") for i in range(20)]
+
+
+@cached()
+def _slow_lookup(calls_path):
+    with open(calls_path, "a") as calls:
+        calls.write("call\n")
+    time.sleep(0.2)
+    return "answer"
+
+
+@cached()
+def _failing_lookup(calls_path):
+    with open(calls_path, "a") as calls:
+        calls.write("call\n")
+    time.sleep(0.5)
+    raise ConnectionError("network down")
+
+
+def _try_failing_lookup(calls_path):
+    try:
+        return _failing_lookup(calls_path)
+    except ConnectionError as error:
+        return str(error)
+
+
+def test_cache_dir_follows_xdg(monkeypatch, tmp_path):
+
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert cache_dir() == tmp_path / "pycee"
+
+
+def test_set_and_get(cache_fixture):
+
+    questions = (Question(id="1", has_accepted=True),)
+    cache_fixture.set("questions", questions)
+    assert cache_fixture.get("questions") == questions
+
+
+def test_get_missing_key_returns_default(cache_fixture):
+
+    assert cache_fixture.get("missing") is None
+    assert cache_fixture.get("missing", "default") == "default"
+
+
+def test_expired_entries_are_not_returned(cache_fixture):
+
+    cache_fixture.set("key", "value", ttl=-1)
+    assert cache_fixture.get("key") is None
+
+
+def test_least_recently_used_entries_are_evicted(cache_fixture):
+
+    cache_fixture.set("first", "a" * 100)
+    cache_fixture.max_size = cache_fixture.size() * 2
+    cache_fixture.set("second", "b" * 100)
+    cache_fixture.get("first")
+    cache_fixture.set("third", "c" * 100)
+
+    assert cache_fixture.get("first") is not None
+    assert cache_fixture.get("second") is None
+    assert cache_fixture.get("third") is not None
+
+
+def test_clear(cache_fixture):
+
+    cache_fixture.set("key", "value")
+    cache_fixture.clear()
+    assert cache_fixture.get("key") is None
+    assert cache_fixture.size() == 0
+
+
+def test_remove_key_locks_keeps_held_locks(shared_cache_fixture):
+
+    @cached()
+    def double(value):
+        return value * 2
+
+    double(1), double(2)
+    with key_lock("held"):
+        assert remove_key_locks() == 2
+        assert len(list((cache_dir() / "locks").iterdir())) == 1
+    assert remove_key_locks() == 1
+    assert list((cache_dir() / "locks").iterdir()) == []
+
+
+def test_concurrent_writers(tmp_path):
+
+    path = tmp_path / "cache.sqlite3"
+    with Pool(4) as pool:
+        results = pool.map(_set_many, [(path, worker) for worker in range(4)])
+    assert results == [list(range(20))] * 4
+
+
+def test_cached_decorator_ignores_keyword_arguments(shared_cache_fixture):
+
+    calls = []
+
+    @cached()
+    def double(value, workers=1):
+        calls.append(value)
+        return value * 2
+
+    assert double(2, workers=1) == 4
+    assert double(2, workers=5) == 4
+    assert calls == [2]
+
+
+def test_cached_decorator_computes_once_across_processes(tmp_path):
+
+    calls_path = str(tmp_path / "calls")
+    with Pool(4) as pool:
+        results = pool.map(_slow_lookup, [calls_path] * 4)
+
+    assert results == ["answer"] * 4
+    assert pathlib.Path(calls_path).read_text() == "call\n"
+
+
+def test_cached_decorator_fails_waiters_fast_across_processes(tmp_path):
+
+    calls_path = tmp_path / "calls"
+    with Pool(4) as pool:
+        results = pool.map(_try_failing_lookup, [str(calls_path)] * 4)
+
+    assert results == ["network down"] * 4
+    assert calls_path.read_text() == "call\n"
+
+    # the error is not cached, later calls try again
+    assert _try_failing_lookup(str(calls_path)) == "network down"
+    assert calls_path.read_text() == "call\n" * 2
+
+
+def test_cached_decorator_keeps_empty_results_briefly(shared_cache_fixture, monkeypatch):
+
+    calls = []
+
+    @cached(negative=True)
+    def search(query):
+        calls.append(query)
+        return ()
+
+    monkeypatch.setenv("PYCEE_NEGATIVE_TTL", "60")
+    assert search("rare error") == ()
+    assert search("rare error") == ()
+    assert calls == ["rare error"]
+    assert export_bundle(pathlib.Path(shared_cache_fixture.path).with_suffix(".gz"), shared_cache_fixture) == 0
+
+    monkeypatch.setenv("PYCEE_NEGATIVE_TTL", "-1")
+    search("dead end")
+    search("dead end")
+    assert calls == ["rare error", "dead end", "dead end"]
+
+
+def test_cached_decorator_caches_errors(shared_cache_fixture):
+
+    calls = []
+
+    @cached(negative=True, errors=(ConnectionError,))
+    def search(query):
+        calls.append(query)
+        raise ConnectionError("blocked")
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError, match="blocked"):
+            search("query")
+    assert calls == ["query"]
+
+
+def _expire(cache, key, seconds_ago):
+    cache._connection().execute("UPDATE entries SET expires_at = ? WHERE key = ?", (time.time() - seconds_ago, key))
+
+
+def test_stale_values_are_served_while_refreshed(shared_cache_fixture):
+
+    calls = []
+
+    @cached(stale=True)
+    def search(query):
+        calls.append(query)
+        return (query, len(calls))
+
+    assert search("query") == ("query", 1)
+    _expire(shared_cache_fixture, "search('query',)", seconds_ago=60)
+
+    assert search("query") == ("query", 1)
+    wait_for_refreshes()
+    assert calls == ["query", "query"]
+    assert search("query") == ("query", 2)
+
+
+def test_values_past_max_staleness_are_refreshed_right_away(shared_cache_fixture):
+
+    calls = []
+
+    @cached(stale=True)
+    def search(query):
+        calls.append(query)
+        return (query, len(calls))
+
+    search("query")
+    _expire(shared_cache_fixture, "search('query',)", seconds_ago=MAX_STALENESS + 60)
+    assert search("query") == ("query", 2)
+
+
+def test_failed_refreshes_keep_stale_values(shared_cache_fixture):
+
+    @cached(stale=True)
+    def search(query):
+        if search.fail:
+            raise ConnectionError("offline")
+        return (query,)
+
+    search.fail = False
+    search("query")
+    _expire(shared_cache_fixture, "search('query',)", seconds_ago=60)
+
+    search.fail = True
+    assert search("query") == ("query",)
+    wait_for_refreshes()
+    assert search("query") == ("query",)
+
+
+def test_exiting_runs_do_not_wait_for_slow_refreshes(shared_cache_fixture):
+
+    release = threading.Event()
+
+    @cached(stale=True)
+    def search(query):
+        if search.slow:
+            release.wait(10)
+        return (query,)
+
+    search.slow = False
+    search("query")
+    _expire(shared_cache_fixture, "search('query',)", seconds_ago=60)
+
+    search.slow = True
+    start = time.monotonic()
+    assert search("query") == ("query",)
+    wait_for_refreshes(REFRESH_EXIT_WAIT)
+
+    assert time.monotonic() - start < REFRESH_EXIT_WAIT + 1
+    assert all(thread.daemon for thread in cache_module._refreshes)
+    release.set()
+    wait_for_refreshes()
+
+
+def test_caches_without_negative_entries_are_migrated(tmp_path):
+
+    path = tmp_path / "old.sqlite3"
+    with sqlite3.connect(str(path)) as connection:
+        connection.execute(
+            "CREATE TABLE entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+            " stored_at REAL NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+    connection.close()
+
+    cache = Cache(path)
+    cache.set("key", "value", negative=True)
+    assert cache.get("key") == "value"
+    assert list(cache.entries()) == []
+    cache.close()
+
+
+def test_export_and_import_bundle(cache_fixture, tmp_path):
+
+    questions = (Question(id="1", has_accepted=True),)
+    cache_fixture.set("questions", questions)
+    cache_fixture.set("expired", "value", ttl=-1)
+    bundle = tmp_path / "bundle.gz"
+
+    assert export_bundle(bundle, cache_fixture) == 1
+
+    other_cache = Cache(tmp_path / "other.sqlite3")
+    assert import_bundle(bundle, other_cache) == 1
+    assert other_cache.get("questions") == questions
+    # importing again does not replace entries that are as new
+    assert import_bundle(bundle, other_cache) == 0
+
+
+def test_bundles_store_plain_data(cache_fixture, tmp_path):
+
+    answers = (Answer(id="2", accepted=True, score=5, body="<p>Use len()</p>", author="ana", profile_image=None),)
+    values = {
+        "answers": answers,
+        "rendered": {"markdown": "Use len()", "ansi": None},
+        "summary": "Use len()",
+        "list": [1, 2.5, [True]],
+    }
+    for key, value in values.items():
+        cache_fixture.set(key, value)
+    bundle = tmp_path / "bundle.gz"
+    export_bundle(bundle, cache_fixture)
+
+    with gzip.open(bundle, "rt") as file:
+        records = [json.loads(line) for line in file][1:]
+    assert records[0]["value"] == {
+        "tuple": [{"answer": {"id": "2", "accepted": True, "score": 5, "body": "<p>Use len()</p>",
+                              "author": "ana", "profile_image": None, "last_edit": None}}]
+    }
+
+    other_cache = Cache(tmp_path / "other.sqlite3")
+    assert import_bundle(bundle, other_cache) == len(values)
+    assert {key: other_cache.get(key) for key in values} == values
+
+
+@pytest.mark.parametrize(
+    "record",
+    [
+        {"value": "no key", "stored_at": 0, "expires_at": 0},
+        {"key": "k", "value": {"pickle": "gASV"}, "stored_at": 0, "expires_at": 1e12},
+        {"key": "k", "value": {"answer": {"id": "1"}}, "stored_at": 0, "expires_at": 1e12},
+    ],
+)
+def test_import_bundle_rejects_malformed_records(cache_fixture, tmp_path, record):
+
+    bundle = tmp_path / "bundle.gz"
+    with gzip.open(bundle, "wt") as file:
+        file.write(json.dumps({"format": "pycee-cache-bundle", "version": 2}) + "\n")
+        file.write(json.dumps(record) + "\n")
+
+    with pytest.raises(ValueError, match="Malformed"):
+        import_bundle(bundle, cache_fixture)
+
+
+def test_import_bundle_rejects_other_files(cache_fixture, tmp_path):
+
+    bundle = tmp_path / "not_a_bundle.gz"
+    with gzip.open(bundle, "wt") as file:
+        file.write('{"format": "something else"}\n')
+
+    with pytest.raises(ValueError):
+        import_bundle(bundle, cache_fixture)
@@ -1,6 +1,6 @@
 import pytest
 
-from pycee.errors import handle_index_error_locally, handle_index_error
+from pycee.errors import classify, handle_index_error_locally, handle_index_error
 from pycee.utils import HINT_MESSAGES
 
 
@@ -14,7 +14,7 @@ from pycee.utils import HINT_MESSAGES
 )
 def test_index_error_locally(error_message, error_line, sequence, monkeypatch):
     monkeypatch.setitem(HINT_MESSAGES, "IndexError", "<sequence> <line>")
-    assert handle_index_error_locally(error_message, error_line) == f"{sequence} {error_line}"
+    assert handle_index_error_locally(classify(error_message), error_line) == f"{sequence} {error_line}"
 
 
 @pytest.mark.parametrize(
@@ -36,3 +36,12 @@ def test_index_error_locally(error_message, error_line, sequence, monkeypatch):
 )
 def test_index_error(error_message, result):
     assert handle_index_error(error_message) == result
+
+
+def test_index_error_locally_with_other_sequences(monkeypatch):
+    monkeypatch.setitem(HINT_MESSAGES, "IndexError", "<sequence> <line>")
+    assert handle_index_error_locally(classify("IndexError: string index out of range"), 3) == "string 3"
+    assert handle_index_error_locally(classify("IndexError: list assignment index out of range"), 3) == "list 3"
+    assert handle_index_error_locally(classify("IndexError: pop from empty list"), 3) == "list 3"
+    assert handle_index_error_locally(classify("IndexError: not a known message"), 3) is None
+    assert handle_index_error_locally(classify("IndexError: pop index out of range"), 3) is None
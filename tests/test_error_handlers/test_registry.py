@@ -0,0 +1,86 @@
+from argparse import Namespace
+
+import pytest
+
+from pycee import errors
+from pycee.errors import ErrorMatch, classify, handle_error, register_handler
+
+
+@pytest.fixture()
+def registry_fixture(monkeypatch):
+    """ Handlers registered by a test are dropped after it """
+    monkeypatch.setattr(errors, "HANDLERS", dict(errors.HANDLERS))
+    monkeypatch.setattr(errors, "TEMPLATES", list(errors.TEMPLATES))
+    yield
+    errors._compile_templates.cache_clear()
+
+
+def test_classify_extracts_template_fields():
+
+    match = classify("TypeError: unsupported operand type(s) for +: 'int' and 'str'")
+    assert match == ErrorMatch(
+        error_type="TypeError",
+        template="unsupported operand",
+        fields={"operator": "+", "left": "int", "right": "str"},
+    )
+
+
+def test_classify_prefers_templates_registered_first():
+
+    match = classify("IndexError: list assignment index out of range")
+    assert match.template == "assignment out of range"
+    assert match.fields == {"sequence": "list"}
+
+
+def test_classify_pop_index_out_of_range():
+
+    match = classify("IndexError: pop index out of range")
+    assert match.template == "pop out of range"
+    assert match.fields == {}
+
+
+def test_classify_unknown_message():
+
+    assert classify("IndexError: something else entirely") is None
+    assert classify("RecursionError: maximum recursion depth exceeded") is None
+
+
+def test_new_handlers_plug_in_without_editing_handle_error(registry_fixture):
+
+    @register_handler("RecursionError", {"depth": "maximum recursion depth exceeded{context}"})
+    def _recursion_error(error_info, match):
+        return "query:" + match.fields["context"], "hint"
+
+    error_info = {"type": "RecursionError", "message": "RecursionError: maximum recursion depth exceeded in comparison"}
+    query, hint, _ = handle_error(error_info, Namespace(n_questions=3, dry_run=False))
+
+    assert query == "query: in comparison&pagesize=3"
+    assert hint == "hint"
+
+
+def test_handle_error_without_handler_searches_the_message():
+
+    error_info = {"type": "RuntimeError", "message": "RuntimeError: boom"}
+    query, hint, _ = handle_error(error_info, Namespace(n_questions=3, dry_run=False))
+
+    assert query == errors.url_for_error("RuntimeError: boom") + "&pagesize=3"
+    assert hint is None
+
+
+@pytest.mark.parametrize(
+    "error_type, message",
+    [
+        ("IndexError", "IndexError: list index out of range"),
+        ("TypeError", "TypeError: not all arguments converted during string formatting"),
+    ],
+)
+def test_handle_error_classifies_messages_once(error_type, message, monkeypatch):
+
+    calls = []
+    monkeypatch.setattr(errors, "classify", lambda text: calls.append(text) or classify(text))
+
+    error_info = {"type": error_type, "message": message, "line": 2}
+    query, hint, _ = handle_error(error_info, Namespace(n_questions=3, dry_run=False))
+
+    assert calls == [message]
+    assert query
@@ -2,8 +2,9 @@ from pycee import errors
 
 
 def test_handle_type_error():
+    error_message = "TypeError: unsupported operand type(s) for +: 'int' and 'str'"
     assert (
-        errors.handle_type_error("TypeError: unsupported operand type(s) for +: 'int' and 'str'")
+        errors.handle_type_error(error_message, errors.classify(error_message))
         == "https://api.stackexchange.com/2.2/search?site=stackoverflow&order=desc&sort=relevance&tagged=python"
         "&intitle=typeerror+unsupported+operand+type+s+for+int+and+str"
     )
@@ -0,0 +1,69 @@
+import pytest
+
+from pycee import index
+from pycee.answers import ask_index
+from pycee.errors import url_for_error, set_pagesize
+from pycee.utils import Question, Answer
+
+
+POSTS_XML = """<?xml version="1.0" encoding="utf-8"?>
+<posts>
+  <row Id="1" PostTypeId="1" AcceptedAnswerId="3" Score="50" Title="IndexError: list index out of range" Tags="&lt;python&gt;&lt;list&gt;" />
+  <row Id="2" PostTypeId="1" Score="10" Title="IndexError: list index out of range in java" Tags="&lt;java&gt;" />
+  <row Id="3" PostTypeId="2" ParentId="1" Score="20" Body="&lt;p&gt;Accepted&lt;/p&gt;" OwnerDisplayName="author 3" />
+  <row Id="4" PostTypeId="2" ParentId="1" Score="30" Body="&lt;p&gt;Most voted&lt;/p&gt;" OwnerUserId="44" />
+  <row Id="5" PostTypeId="2" ParentId="2" Score="5" Body="&lt;p&gt;Java&lt;/p&gt;" OwnerDisplayName="author 5" />
+  <row Id="6" PostTypeId="1" Score="1" Title="Why is my list index out of range?" Tags="|python|" />
+</posts>
+"""
+
+
+@pytest.fixture()
+def index_fixture(tmp_path, monkeypatch):
+    """ An offline index built from a tiny data dump """
+    dump = tmp_path / "Posts.xml"
+    dump.write_text(POSTS_XML)
+    path = tmp_path / "index.sqlite3"
+    index.import_dump(dump, path)
+    monkeypatch.setattr(index, "index_path", lambda: path)
+    yield path
+    connection = index._connections.pop(str(path), None)
+    if connection:
+        connection.close()
+
+
+def test_import_dump_keeps_only_python_posts(index_fixture, tmp_path):
+
+    # importing the same dump again must not duplicate anything
+    assert index.import_dump(tmp_path / "Posts.xml", index_fixture) == (2, 2)
+    connection = index.connect(index_fixture)
+    assert connection.execute("SELECT id FROM questions ORDER BY id").fetchall() == [(1,), (6,)]
+    assert connection.execute("SELECT id FROM answers ORDER BY id").fetchall() == [(3,), (4,)]
+
+
+def test_search_matches_intitle_phrase(index_fixture):
+
+    query = set_pagesize(url_for_error("IndexError: list index out of range"), 3)
+    assert index.search(query) == (Question(id="1", has_accepted=True),)
+
+
+def test_search_skips_unanswered_questions(index_fixture):
+
+    query = url_for_error("list index out of range")
+    assert index.search(query) == (Question(id="1", has_accepted=True),)
+
+
+def test_search_without_index_raises(tmp_path):
+
+    with pytest.raises(FileNotFoundError):
+        index.search(url_for_error("IndexError"), tmp_path / "missing.sqlite3")
+
+
+def test_ask_index_picks_most_voted_and_accepted_answers(index_fixture):
+
+    query = url_for_error("IndexError: list index out of range")
+    _, answers = ask_index(query, {}, None)
+    assert answers == (
+        Answer(id="4", accepted=False, score=30, body="<p>Most voted</p>", author="user44", profile_image=None),
+        Answer(id="3", accepted=True, score=20, body="<p>Accepted</p>", author="author 3", profile_image=None),
+    )
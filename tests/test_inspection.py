@@ -1,3 +1,6 @@
+import sys
+import time
+
 import pytest
 from collections import defaultdict
 
@@ -11,6 +14,9 @@ from pycee.inspection import (
     get_code,
     get_packages,
     get_offending_line,
+    run_script_in_process,
+    parse_traceback,
+    Frame,
 )
 
 
@@ -140,3 +146,125 @@ def test_get_packages():
     )
 
     assert get_packages(error_message) == packages
+
+
+@pytest.fixture()
+def nested_error_file_fixture(tmpdir):
+    """ Simulate a file that raises an error inside a function """
+    source = tmpdir.join("nested_error.py")
+    source.write("def first(items):\n    return items[0]\n\n\nprint('noise')\nfirst([])\n")
+    return source
+
+
+@pytest.fixture()
+def syntax_error_file_fixture(tmpdir):
+    """ Simulate a file that cannot be compiled """
+    source = tmpdir.join("syntax_error.py")
+    source.write("x = 1\nprint('foo'\n")
+    return source
+
+
+@pytest.mark.parametrize("fixture_name", ["source_file_fixture", "nested_error_file_fixture"])
+def test_in_process_error_info_matches_subprocess(fixture_name, request):
+
+    path = str(request.getfixturevalue(fixture_name))
+    assert get_error_info(path, in_process=True) == get_error_info(path)
+
+
+def test_in_process_error_info_of_syntax_error(syntax_error_file_fixture):
+
+    path = str(syntax_error_file_fixture)
+    error_info = get_error_info(path, in_process=True)
+    assert error_info["type"] == "SyntaxError"
+    assert error_info["line"] == get_error_info(path)["line"]
+    assert error_info["file"] == path
+
+
+def test_run_script_in_process_returns_none_if_no_error(errorless_file_fixture):
+
+    assert run_script_in_process(str(errorless_file_fixture)) is None
+
+
+def test_run_script_in_process_treats_sys_exit_as_no_error(tmpdir):
+
+    source = tmpdir.join("exits.py")
+    source.write("import sys\nsys.exit(3)\n")
+    assert run_script_in_process(str(source)) is None
+
+
+
+def test_run_script_in_process_unloads_modules_of_the_script(tmpdir):
+
+    first, second = tmpdir.mkdir("first"), tmpdir.mkdir("second")
+    first.join("helpers.py").write("VALUE = 1\n")
+    second.join("helpers.py").write("")
+    for directory in (first, second):
+        directory.join("script.py").write("import json\nimport helpers\nhelpers.VALUE\n")
+
+    assert run_script_in_process(str(first.join("script.py"))) is None
+    assert "helpers" not in sys.modules
+    assert isinstance(run_script_in_process(str(second.join("script.py"))), AttributeError)
+
+
+CHAINED_TRACEBACK = """Traceback (most recent call last):
+  File "script.py", line 3, in <module>
+    value = prices["apple"]
+            ~~~~~~^^^^^^^^^
+KeyError: 'apple'
+
+During handling of the above exception, another exception occurred:
+
+Traceback (most recent call last):
+  File "script.py", line 5, in <module>
+    total(prices)
+  File "script.py", line 9, in total
+    return sum(prices) / 0
+ZeroDivisionError: division by zero
+"""
+
+
+def test_parse_traceback_returns_every_frame_and_chained_exception():
+
+    first, last = parse_traceback(CHAINED_TRACEBACK)
+
+    assert first.frames == [Frame("script.py", 3, "<module>", 'value = prices["apple"]')]
+    assert first.message == "KeyError: 'apple'"
+    assert first.chain is None
+    assert last.frames == [
+        Frame("script.py", 5, "<module>", "total(prices)"),
+        Frame("script.py", 9, "total", "return sum(prices) / 0"),
+    ]
+    assert last.message == "ZeroDivisionError: division by zero"
+    assert last.chain == "context"
+
+
+def test_error_line_comes_from_the_last_exception():
+
+    assert get_error_line(CHAINED_TRACEBACK) == 5
+    assert get_file_name(CHAINED_TRACEBACK) == "script.py"
+
+
+def test_parse_traceback_of_syntax_error():
+
+    traceback = '  File "script.py", line 2\n    print(\n         ^\nSyntaxError: unexpected EOF while parsing\n'
+    (exception,) = parse_traceback(traceback)
+
+    assert exception.frames == [Frame("script.py", 2, None, "print(")]
+    assert exception.message == "SyntaxError: unexpected EOF while parsing"
+
+
+def test_parse_traceback_in_linear_time():
+
+    frame = '  File "{}", line {}, in recurse\n    return recurse(n + 1)\n'
+    frames = "".join(frame.format("a" * (i % 80) + "/script.py", i) for i in range(20000))
+    traceback = "Traceback (most recent call last):\n" + frames
+    traceback += "  [Previous line repeated 996 more times]\nRecursionError: maximum recursion depth exceeded\n"
+
+    start = time.perf_counter()
+    (exception,) = parse_traceback(traceback)
+    elapsed = time.perf_counter() - start
+
+    assert len(traceback) > 1_000_000
+    assert len(exception.frames) == 20000
+    assert exception.message == "RecursionError: maximum recursion depth exceeded"
+    assert elapsed < 1
@@ -0,0 +1,35 @@
+from pycee.utils import Answer, parse_args, print_answers_stream
+
+
+def make_answer(score):
+    return Answer(id=str(score), accepted=False, score=score, body="", author="", profile_image=None)
+
+
+def test_print_answers_stream_prints_hint_first_and_footer(capsys):
+
+    stream = iter([("first answer", make_answer(10)), ("second answer", make_answer(50))])
+    print_answers_stream(stream, "a hint", None, parse_args(["foo.py"]))
+    out, _ = capsys.readouterr()
+
+    assert out.index("a hint") < out.index("first answer") < out.index("second answer")
+    assert out.strip().endswith("Solutions sorted by votes: 2, 1")
+
+
+def test_print_answers_stream_stops_at_n_answers(capsys):
+
+    stream = iter([(f"answer {i}", make_answer(10 - i)) for i in range(5)])
+    print_answers_stream(stream, None, None, parse_args(["foo.py", "-a", "2"]))
+    out, _ = capsys.readouterr()
+
+    assert "answer 1" in out
+    assert "answer 2" not in out
+    assert "sorted by votes" not in out
+
+
+def test_print_answers_stream_without_answers(capsys):
+
+    print_answers_stream(iter([]), None, None, parse_args(["foo.py", "-s"]))
+    out, _ = capsys.readouterr()
+
+    assert "Pycee hint" not in out
+    assert "couldn't find answers" in out
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+from httmock import all_requests, HTTMock
+
+from pycee import profiling
+from pycee.answers import get_answers
+from pycee.utils import parse_args
+
+
+@pytest.fixture()
+def profiling_fixture():
+    profiling.enable()
+    yield
+    profiling.disable()
+
+
+def test_spans_are_not_recorded_when_disabled():
+
+    with profiling.span("stage") as span:
+        span.set_attribute("key", "value")
+
+    assert not profiling.enabled()
+    assert profiling.disable() == []
+
+
+def test_nested_spans(profiling_fixture):
+
+    with profiling.span("outer") as outer:
+        with profiling.span("inner", answer="1") as inner:
+            inner.set_attribute("cache_hit", True)
+        with pytest.raises(ValueError):
+            with profiling.span("failing"):
+                raise ValueError("boom")
+
+    spans = {span.name: span for span in profiling.disable()}
+
+    assert spans["outer"].parent_span_id is None
+    assert spans["inner"].parent_span_id == outer.span_id
+    assert spans["inner"].attributes == {"answer": "1", "cache_hit": True}
+    assert spans["failing"].error == "ValueError('boom')"
+    assert spans["outer"].start_time <= spans["inner"].start_time <= spans["inner"].end_time <= spans["outer"].end_time
+
+
+def test_write_json_lines_and_otlp(profiling_fixture, tmp_path):
+
+    with profiling.span("outer"):
+        with profiling.span("inner", candidates=3):
+            pass
+    spans = profiling.disable()
+
+    profiling.write(tmp_path / "profile.jsonl", spans)
+    lines = [json.loads(line) for line in (tmp_path / "profile.jsonl").read_text().splitlines()]
+    assert [line["name"] for line in lines] == ["inner", "outer"]
+    assert lines[0]["parent_span_id"] == lines[1]["span_id"]
+
+    profiling.write(tmp_path / "profile.json", spans)
+    trace = json.loads((tmp_path / "profile.json").read_text())
+    otlp_spans = trace["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert otlp_spans[0]["attributes"] == [{"key": "candidates", "value": {"intValue": "3"}}]
+    assert otlp_spans[1]["parentSpanId"] == ""
+
+
+def test_http_requests_and_cache_lookups_are_traced(profiling_fixture):
+
+    @all_requests
+    def one_question_without_answers(url, request):
+        if url.path.endswith("/search"):
+            return {"status_code": 200, "content": {"items": [{"is_answered": True, "question_id": 1}]}}
+        return {"status_code": 200, "content": {"items": []}}
+
+    query = "https://api.stackexchange.com/2.2/search?site=stackoverflow&intitle=foo"
+    with HTTMock(one_question_without_answers):
+        get_answers(query, {"message": "foo"}, parse_args(["foo.py"]))
+        get_answers(query, {"message": "foo"}, parse_args(["foo.py"]))
+
+    spans = profiling.disable()
+    searches = [span for span in spans if span.attributes.get("function") == "_cached_ask_stackoverflow"]
+    assert [span.attributes["cache_hit"] for span in searches] == [False, True]
+    assert [span.attributes["status_code"] for span in spans if span.name == "http.get"] == [200, 200]
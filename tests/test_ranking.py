@@ -0,0 +1,41 @@
+import time
+
+from pycee.ranking import rank_answers
+from pycee.utils import Answer
+
+
+def make_answer(answer_id, score, body):
+    return Answer(id=answer_id, accepted=False, score=score, body=body, author="", profile_image=None)
+
+
+generic = make_answer("1", 2000, "<p>Indexes of lists start at 0, so the last valid index is the length minus one.</p>")
+matching = make_answer(
+    "2",
+    30,
+    "<p>The <code>students</code> list is empty when <code>grades</code> is read.</p>"
+    "<pre><code>if students:\n    best = students[0]\n</code></pre>",
+)
+error_info = {"message": "IndexError: list index out of range", "offending_line": "best = students[0]"}
+
+
+def test_answers_matching_the_code_beat_generic_ones():
+
+    assert rank_answers([generic, matching], error_info) == [matching, generic]
+
+
+def test_votes_break_ties_between_unrelated_answers():
+
+    low = make_answer("3", 5, "<p>Something else entirely.</p>")
+    high = make_answer("4", 50, "<p>Another unrelated thing.</p>")
+    assert rank_answers([low, high], {"message": "KeyError: 'a'"}) == [high, low]
+
+
+def test_ranking_many_candidates_is_fast():
+
+    candidates = [make_answer(str(i), i, generic.body + matching.body * (i % 3)) for i in range(500)]
+
+    start = time.perf_counter()
+    ranked = rank_answers(candidates, error_info)
+    assert time.perf_counter() - start < 1
+
+    assert sorted(ranked, key=lambda answer: int(answer.id)) == candidates
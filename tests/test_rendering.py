@@ -0,0 +1,65 @@
+import pytest
+
+from pycee import rendering
+from pycee.rendering import to_ansi, to_markdown
+from pycee.utils import Answer
+
+
+def make_answer(body="<p>Use <code>len(items)</code></p>", last_edit=100):
+    return Answer(id="1", accepted=True, score=10, body=body, author="", profile_image=None, last_edit=last_edit)
+
+
+@pytest.fixture()
+def no_parsing_fixture(monkeypatch):
+    """ Make any html or markdown parsing fail """
+
+    def fail(text):
+        raise AssertionError("rendered again")
+
+    def disable():
+        monkeypatch.setattr(rendering, "_html_to_markdown", fail)
+        monkeypatch.setattr(rendering, "_markdown_to_ansi", fail)
+
+    return disable
+
+
+def test_rendered_answers_come_from_the_cache(no_parsing_fixture):
+
+    markdown, ansi = to_markdown(make_answer()), to_ansi(make_answer())
+    assert "len(items)" in markdown
+    assert "len(items)" in ansi
+
+    no_parsing_fixture()
+    assert to_markdown(make_answer()) == markdown
+    assert to_ansi(make_answer()) == ansi
+
+
+def test_edited_answers_are_rendered_again():
+
+    to_markdown(make_answer())
+    edited = make_answer(body="<p>Use <code>range(len(items))</code></p>", last_edit=200)
+    assert "range(len(items))" in to_markdown(edited)
+
+
+def test_answers_without_last_edit_are_told_apart_by_body(no_parsing_fixture):
+
+    first = to_markdown(make_answer(body="<p>first</p>", last_edit=None))
+    second = to_markdown(make_answer(body="<p>second</p>", last_edit=None))
+    assert "first" in first and "second" in second
+
+    no_parsing_fixture()
+    assert to_markdown(make_answer(body="<p>first</p>", last_edit=None)) == first
+
+
+def test_rendered_summaries_come_from_the_cache(no_parsing_fixture):
+
+    answer = make_answer()
+    to_markdown(answer)
+    summary = to_ansi(answer, "Use `len(items)` (summary)")
+    other_summary = to_ansi(answer, "Another summary")
+    assert "summary" in summary and "Another" in other_summary
+
+    no_parsing_fixture()
+    assert to_ansi(answer, "Use `len(items)` (summary)") == summary
+    with pytest.raises(AssertionError):
+        to_ansi(answer, "A summary never rendered")
@@ -0,0 +1,185 @@
+import json
+
+import pytest
+import requests
+from httmock import all_requests, HTTMock
+
+from pycee import scheduler
+from pycee.answers import _cached_ask_stackoverflow, get_answers
+from pycee.scheduler import ApiError, ApiUnavailable, api_get, api_method
+from pycee.utils import parse_args
+
+search_url = "https://api.stackexchange.com/2.2/search?site=stackoverflow"
+
+
+def api_response(content):
+    @all_requests
+    def response(url, request):
+        return {"status_code": 200, "content": content}
+
+    return response
+
+
+@pytest.mark.parametrize(
+    "url, method",
+    [
+        (search_url, "/search"),
+        ("https://api.stackexchange.com/2.2/questions/1;2/answers?site=stackoverflow", "/questions/{ids}/answers"),
+    ],
+)
+def test_api_method(url, method):
+    assert api_method(url) == method
+
+
+def test_api_get_records_quota_and_backoff():
+
+    with HTTMock(api_response({"items": [], "quota_remaining": 250, "backoff": 3})):
+        assert api_get(search_url)["items"] == []
+
+    state = scheduler._read_state()
+    assert state["quota_remaining"] == 250
+    assert state["backoff_until"]["/search"] > state["updated_at"]
+
+
+def test_api_get_gives_up_on_long_backoffs():
+
+    with HTTMock(api_response({"items": [], "backoff": scheduler.MAX_WAIT + 60})):
+        api_get(search_url)
+        with pytest.raises(ApiUnavailable):
+            api_get(search_url)
+
+
+def test_api_get_stops_when_quota_is_exhausted():
+
+    with HTTMock(api_response({"items": [], "quota_remaining": scheduler.QUOTA_RESERVE})):
+        api_get(search_url)
+        with pytest.raises(ApiUnavailable):
+            api_get(search_url)
+
+
+def test_api_get_raises_on_api_errors():
+
+    throttled = {"error_id": 502, "error_name": "throttle_violation", "error_message": "too many requests"}
+    with HTTMock(api_response(throttled)):
+        with pytest.raises(ApiUnavailable, match="too many requests"):
+            api_get(search_url)
+
+
+def test_get_answers_degrades_to_cached_answers(capsys):
+
+    throttled = {"error_id": 502, "error_name": "throttle_violation", "error_message": "too many requests"}
+    error_info = {"message": "IndexError: list index out of range"}
+    with HTTMock(api_response(throttled)):
+        assert get_answers(search_url, error_info, parse_args(["foo.py"])) == ([], [])
+    out, err = capsys.readouterr()
+    assert out == ""
+    assert "too many requests" in err
+    assert "no answers are cached" in err
+
+
+def test_get_answers_strict_raises(capsys):
+
+    throttled = {"error_id": 502, "error_name": "throttle_violation", "error_message": "too many requests"}
+    error_info = {"message": "IndexError: list index out of range"}
+    with HTTMock(api_response(throttled)):
+        with pytest.raises(ApiUnavailable):
+            get_answers(search_url, error_info, parse_args(["foo.py"]), strict=True)
+    assert capsys.readouterr() == ("", "")
+
+
+def test_api_get_raises_on_network_errors():
+
+    @all_requests
+    def unreachable(url, request):
+        raise requests.ConnectionError("no route to host")
+
+    with HTTMock(unreachable):
+        with pytest.raises(ApiUnavailable, match="no route to host"):
+            api_get(search_url)
+
+
+def test_get_answers_without_cache_does_not_mention_cached_answers(capsys):
+
+    throttled = {"error_id": 502, "error_name": "throttle_violation", "error_message": "too many requests"}
+    error_info = {"message": "IndexError: list index out of range"}
+    with HTTMock(api_response(throttled)):
+        assert get_answers(search_url, error_info, parse_args(["foo.py", "-f"])) == ([], [])
+    _, err = capsys.readouterr()
+    assert "too many requests" in err
+    assert "cached" not in err
+
+
+def test_backoff_refusals_are_not_cached():
+
+    requested_urls = []
+
+    @all_requests
+    def backing_off(url, request):
+        requested_urls.append(request.url)
+        return {"status_code": 200, "content": {"items": [], "backoff": scheduler.MAX_WAIT + 1}}
+
+    with HTTMock(backing_off):
+        _cached_ask_stackoverflow(search_url + "&intitle=first")
+        with pytest.raises(ApiUnavailable):
+            _cached_ask_stackoverflow(search_url + "&intitle=second")
+
+        # once the backoff is over, the search reaches the API
+        scheduler._write_state(dict(scheduler._read_state(), backoff_until={}))
+        _cached_ask_stackoverflow(search_url + "&intitle=second")
+
+    assert len(requested_urls) == 2
+
+
+def test_throttling_is_not_cached_and_backs_off():
+
+    requested_urls = []
+
+    @all_requests
+    def throttling(url, request):
+        requested_urls.append(request.url)
+        message = "too many requests from this IP, more requests available in 120 seconds"
+        return {"status_code": 400, "content": {"error_id": 502, "error_message": message}}
+
+    with HTTMock(throttling):
+        with pytest.raises(ApiUnavailable) as raised:
+            _cached_ask_stackoverflow(search_url)
+        assert not isinstance(raised.value, ApiError)
+        assert raised.value.error_id == 502
+        assert scheduler._read_state()["backoff_until"]["/search"] > scheduler._read_state()["updated_at"] + 100
+
+        # the backoff refuses the search before it reaches the API
+        with pytest.raises(ApiUnavailable, match="wait"):
+            _cached_ask_stackoverflow(search_url)
+
+        # once the backoff is over, the search is sent again
+        scheduler._write_state(dict(scheduler._read_state(), backoff_until={}))
+        with pytest.raises(ApiUnavailable, match="more requests available"):
+            _cached_ask_stackoverflow(search_url)
+
+    assert len(requested_urls) == 2
+
+
+def test_api_errors_are_cached():
+
+    requested_urls = []
+
+    @all_requests
+    def failing(url, request):
+        requested_urls.append(request.url)
+        return {"status_code": 400, "content": {"error_id": 400, "error_message": "bad parameter"}}
+
+    with HTTMock(failing):
+        for _ in range(2):
+            with pytest.raises(ApiError, match="bad parameter") as raised:
+                _cached_ask_stackoverflow(search_url)
+            assert raised.value.error_id == 400
+
+    assert len(requested_urls) == 1
+
+
+def test_token_bucket_is_shared_through_the_state_file():
+
+    with HTTMock(api_response({"items": []})):
+        for _ in range(3):
+            api_get(search_url)
+    assert scheduler._read_state()["tokens"] < scheduler.BURST - 2
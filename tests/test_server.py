@@ -0,0 +1,98 @@
+import os
+import sys
+import threading
+
+import pytest
+
+from pycee import inspection, pipeline, server
+
+
+@pytest.fixture()
+def script_fixture(tmpdir):
+    """ A script raising an IndexError """
+    source = tmpdir.join("index_error.py")
+    source.write("titles = [1958, 1962]\nprint(titles[5])\n")
+    return source
+
+
+@pytest.fixture()
+def daemon_fixture(tmp_path, monkeypatch):
+    """ A daemon listening on a temporary socket """
+    # the daemon replaces stdout and stderr, monkeypatch puts the original ones back
+    monkeypatch.setattr(sys, "stdout", sys.stdout)
+    monkeypatch.setattr(sys, "stderr", sys.stderr)
+    path = tmp_path / "pycee.sock"
+    daemon = server._Server(str(path), server._Handler)
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    daemon.shutdown()
+    daemon.server_close()
+
+
+def test_forward_without_daemon_returns_none(tmp_path):
+
+    assert server.forward(["foo.py"], tmp_path / "missing.sock") is None
+
+
+def test_socket_path_can_be_set_by_environment(monkeypatch, tmp_path):
+
+    monkeypatch.setenv("PYCEE_SOCKET", str(tmp_path / "custom.sock"))
+    assert server.socket_path() == tmp_path / "custom.sock"
+
+
+def test_handle_captures_output_and_exit_code(script_fixture, monkeypatch):
+
+    monkeypatch.setattr(sys, "stdout", sys.stdout)
+    monkeypatch.setattr(sys, "stderr", sys.stderr)
+    response = server.handle([script_fixture.basename, "--dry-run"], str(script_fixture.dirname))
+    assert "intitle=indexerror+list+index+out+of+range" in response["output"]
+    assert response["exit_code"] == 0
+
+
+def test_forward_runs_pycee_on_the_daemon(daemon_fixture, script_fixture, monkeypatch, capsys):
+
+    monkeypatch.chdir(script_fixture.dirname)
+    exit_code = server.forward([script_fixture.basename, "--dry-run"], daemon_fixture)
+    out, _ = capsys.readouterr()
+    assert exit_code == 0
+    assert "intitle=indexerror+list+index+out+of+range" in out
+
+
+def test_handle_runs_scripts_with_the_client_directory_and_environment(tmpdir, monkeypatch):
+
+    monkeypatch.setattr(sys, "stdout", sys.stdout)
+    monkeypatch.setattr(sys, "stderr", sys.stderr)
+    source = tmpdir.join("data_script.py")
+    source.write("import os\nopen('data.txt').read()\nos.environ['PYCEE_CLIENT_VAR']\n[][1]\n")
+    tmpdir.join("data.txt").write("data")
+
+    env = dict(os.environ, PYCEE_CLIENT_VAR="set")
+    response = server.handle([source.basename, "--dry-run"], str(tmpdir), env)
+
+    assert "intitle=indexerror+list+index+out+of+range" in response["output"]
+
+
+def test_handle_runs_scripts_on_a_subprocess(script_fixture, monkeypatch):
+
+    monkeypatch.setattr(sys, "stdout", sys.stdout)
+    monkeypatch.setattr(sys, "stderr", sys.stderr)
+    monkeypatch.setattr(inspection, "run_script_in_process", None)
+    response = server.handle([script_fixture.basename, "--dry-run", "-i"], str(script_fixture.dirname))
+    assert "intitle=indexerror+list+index+out+of+range" in response["output"]
+
+
+def test_handle_captures_errors_apart(monkeypatch):
+
+    monkeypatch.setattr(sys, "stdout", sys.stdout)
+    monkeypatch.setattr(sys, "stderr", sys.stderr)
+
+    def run(args):
+        print("answers")
+        print("Stackoverflow can't be reached now", file=sys.stderr)
+
+    monkeypatch.setattr(pipeline, "run", run)
+    response = server.handle(["foo.py"], "/tmp")
+
+    assert response["output"] == "answers\n"
+    assert response["errors"] == "Stackoverflow can't be reached now\n"
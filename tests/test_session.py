@@ -0,0 +1,34 @@
+from httmock import all_requests, HTTMock
+
+from pycee import session
+
+
+@all_requests
+def echo_headers_response(url, request):
+    return {"status_code": 200, "content": {"accept_encoding": request.headers["Accept-Encoding"]}}
+
+
+def test_get_session_is_shared():
+
+    assert session.get_session() is session.get_session()
+
+
+def test_close_session_creates_a_new_one_on_next_use():
+
+    first = session.get_session()
+    session.close_session()
+    assert session.get_session() is not first
+
+
+def test_session_pools_connections():
+
+    adapter = session.get_session().get_adapter("https://api.stackexchange.com")
+    assert adapter._pool_connections == session.POOL_CONNECTIONS
+    assert adapter._pool_maxsize == session.POOL_MAXSIZE
+
+
+def test_get_negotiates_compression():
+
+    with HTTMock(echo_headers_response):
+        response = session.get("https://api.stackexchange.com/2.2/search")
+    assert "gzip" in response.json()["accept_encoding"]
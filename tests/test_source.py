@@ -0,0 +1,63 @@
+import pickle
+
+import pytest
+
+from pycee import source
+from pycee.source import get_source
+
+
+@pytest.fixture()
+def source_fixture(tmpdir):
+    """ A small source file with windows and unix line breaks """
+    path = tmpdir.join("code.py")
+    path.write_binary(b"import os\r\nimport math\n\nprint(math.pi)\nmath.dir")
+    return get_source(str(path))
+
+
+def test_line(source_fixture):
+
+    assert len(source_fixture) == 5
+    assert source_fixture.line(1) == "import os"
+    assert source_fixture.line(3) == ""
+    assert source_fixture.line(5) == "math.dir"
+    with pytest.raises(IndexError):
+        source_fixture.line(6)
+
+
+def test_offending_line_past_the_end_is_the_last_line(source_fixture):
+
+    assert source_fixture.offending_line(2) == "import math"
+    assert source_fixture.offending_line(8) == "math.dir"
+
+
+def test_context(source_fixture):
+
+    assert source_fixture.context(1, before=2, after=1) == [(1, "import os"), (2, "import math")]
+    assert source_fixture.context(5, before=1) == [(4, "print(math.pi)"), (5, "math.dir")]
+
+
+def test_text(source_fixture):
+
+    assert str(source_fixture) == "import os\r\nimport math\n\nprint(math.pi)\nmath.dir"
+
+
+def test_files_with_same_content_share_the_line_index(source_fixture, tmpdir):
+
+    copy = tmpdir.join("copy.py")
+    copy.write_binary(b"import os\r\nimport math\n\nprint(math.pi)\nmath.dir")
+    assert get_source(str(copy))._offsets is source_fixture._offsets
+
+
+def test_empty_file(tmpdir):
+
+    path = tmpdir.join("empty.py")
+    path.write("")
+    empty = get_source(str(path))
+    assert not empty
+    assert len(empty) == 0
+    assert empty.offending_line(1) is None
+
+
+def test_pickle_maps_the_file_again(source_fixture):
+
+    assert pickle.loads(pickle.dumps(source_fixture)) == source_fixture
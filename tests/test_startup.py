@@ -0,0 +1,41 @@
+"""Startup benchmark: pycee must start fast when it only needs local work,
+like a dry run or a hint-only run. Heavy dependencies are imported lazily."""
+import pathlib
+import subprocess
+import sys
+
+ROOT_DIR = pathlib.Path(__file__).parent.parent
+# maximum time (in seconds) to import the command line and the hint-only pipeline
+IMPORT_TIME_BUDGET = 0.15
+HEAVY_DEPENDENCIES = ["requests", "html2text", "googlesearch", "consolemd", "bs4"]
+STARTUP_MODULES = ["usage", "pycee.pipeline"]
+
+
+def import_times(modules: list) -> dict:
+    """Import modules in a fresh interpreter using -X importtime.
+    output: a dict mapping each imported module to its cumulative import time in seconds
+    """
+
+    code = "; ".join(f"import {module}" for module in modules)
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT_DIR, capture_output=True, text=True
+    )
+    times = {}
+    # lines look like 'import time:   self [us] | cumulative | imported package'
+    for line in process.stderr.splitlines()[1:]:
+        _, cumulative, package = line.split("|")
+        times[package.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def test_hint_only_path_does_not_import_heavy_dependencies():
+
+    times = import_times(STARTUP_MODULES)
+    assert [module for module in HEAVY_DEPENDENCIES if module in times] == []
+
+
+def test_startup_import_time_within_budget():
+
+    # the fastest of a few runs, so a busy machine does not make this fail
+    startup_time = min(sum(import_times(STARTUP_MODULES)[m] for m in STARTUP_MODULES) for _ in range(3))
+    assert startup_time < IMPORT_TIME_BUDGET
@@ -0,0 +1,66 @@
+from html2text import html2text
+
+from pycee import summarizer
+from pycee.summarizer import MAX_WORDS, SUMMARY_NOTE, summarize, summarize_many
+
+error_info = {"message": "IndexError: list index out of range", "offending_line": "first = items[0]"}
+filler = "".join(
+    f"<p>Paragraph {i} talks about unrelated things like weather and cooking recipes. It goes on for a while.</p>"
+    for i in range(40)
+)
+long_answer = html2text(
+    "<p>You get this error because the list is empty.</p>"
+    + filler
+    + "<pre><code>if items:\n    first = items[0]\n</code></pre>"
+    + "<p>Check the list index before accessing <code>items[0]</code>, there is no index out of range then.</p>"
+    + filler
+)
+
+
+def test_short_answers_are_left_whole():
+
+    answer = html2text("<p>Use <code>items[-1]</code> instead.</p>")
+    assert summarize(answer, error_info) == answer
+
+
+def test_long_answers_keep_relevant_sentences_and_code():
+
+    summary = summarize(long_answer, error_info)
+
+    assert len(summary.split()) <= MAX_WORDS + len(SUMMARY_NOTE.split())
+    assert "You get this error because the list is empty." in summary
+    assert "    if items:\n        first = items[0]" in summary
+    assert "Check the list index" in summary
+    assert "Paragraph 20" not in summary
+    assert summary.rstrip().endswith(SUMMARY_NOTE)
+
+
+def test_answers_are_summarized_in_batches():
+
+    short_answer = html2text("<p>Use <code>items[-1]</code> instead.</p>")
+    summaries = summarize_many([short_answer, long_answer], error_info)
+
+    assert summaries[0] == short_answer
+    assert summaries[1] == summarize(long_answer, error_info)
+
+
+def test_out_of_time_keeps_the_beginning(monkeypatch):
+
+    monkeypatch.setattr(summarizer, "TIME_BUDGET", -1)
+    summary = summarize(long_answer, error_info)
+
+    assert summary.startswith("You get this error because the list is empty.\n\nParagraph 0")
+    assert "Check the list index" not in summary
+
+
+def test_code_keeps_the_indentation_of_its_first_line():
+
+    answer = html2text(
+        "<p>The list index is out of range when the list is empty.</p>"
+        + filler
+        + "<pre><code>    first = items[0]\nexcept IndexError:\n    first = None\n</code></pre>"
+        + filler
+    )
+    summary = summarize(answer, error_info)
+
+    assert "        first = items[0]\n    except IndexError:\n        first = None" in summary
@@ -0,0 +1,69 @@
+import googlesearch
+import pytest
+from httmock import all_requests, HTTMock
+
+from pycee.answers import get_answers
+from pycee.errors import handle_error
+from pycee.utils import parse_args, parse_cache_args
+from pycee.warm import error_info_for, load_corpus, warm_cache
+
+question = {"is_answered": True, "accepted_answer_id": 2, "question_id": 1}
+answer = {"is_accepted": True, "score": 7, "answer_id": 2, "question_id": 1, "body": "<p>Fix</p>", "owner": {"display_name": "a"}}
+
+
+@all_requests
+def api_response(url, request):
+    items = [question] if url.path.endswith("/search") else [answer]
+    return {"status_code": 200, "content": {"items": items}}
+
+
+@all_requests
+def no_network(url, request):
+    raise AssertionError(f"unexpected request to {url.geturl()}")
+
+
+@pytest.fixture()
+def google_fixture(monkeypatch):
+    searches = []
+
+    def search(query, **kwargs):
+        searches.append(query)
+        return ["https://stackoverflow.com/questions/1/some-title"]
+
+    monkeypatch.setattr(googlesearch, "search", search)
+    return searches
+
+
+def test_shipped_corpus_covers_every_handled_error():
+
+    from pycee.errors import HANDLERS
+
+    messages = load_corpus()
+    assert set(HANDLERS) <= {error_info_for(message)["type"] for message in messages}
+    assert not any(message.startswith("#") for message in messages)
+
+
+def test_warm_cache_fills_the_cache_for_regular_runs(tmp_path, google_fixture):
+
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text(
+        "# comment\n"
+        "IndexError: list index out of range\n"
+        "IndexError: list index out of range\n"
+        "\n"
+        "SyntaxError: invalid syntax\n"
+    )
+    args = parse_cache_args(["warm", "--corpus", str(corpus)])
+
+    with HTTMock(api_response):
+        counts = warm_cache(load_corpus(args.corpus), args)
+
+    assert counts == {"messages": 3, "queries": 2, "answered": 2, "unanswered": 0, "failed": 0}
+    assert google_fixture == ["SyntaxError: invalid syntax site:stackoverflow.com"]
+
+    run_args = parse_args(["script.py"])
+    error_info = error_info_for("IndexError: list index out of range")
+    query, _, _ = handle_error(error_info, run_args)
+    with HTTMock(no_network):
+        markdown, answers = get_answers(query, error_info, run_args)
+    assert [a.id for a in answers] == ["2"]
@@ -1,20 +1,147 @@
-from pycee.answers import get_answers
-from pycee.errors import handle_error
-from pycee.inspection import get_error_info
-from pycee.utils import parse_args, remove_cache, print_answers
+import sys
+
+from pycee.utils import parse_args, parse_batch_args, parse_cache_args, parse_index_args, parse_serve_args
+
+# modules of each command are imported only when the command runs,
+# this keeps pycee startup fast, specially when a daemon does the work
 
 
 def main():
 
+    if sys.argv[1:2] == ["cache"]:
+        cache_main(parse_cache_args(sys.argv[2:]))
+        return
+
+    if sys.argv[1:2] == ["index"]:
+        index_main(parse_index_args(sys.argv[2:]))
+        return
+
+    if sys.argv[1:2] == ["batch"]:
+        batch_main(parse_batch_args(sys.argv[2:]))
+        return
+
+    if sys.argv[1:2] == ["serve"]:
+        from pycee.server import serve
+
+        serve(parse_serve_args(sys.argv[2:]).socket)
+        return
+
     args = parse_args()
 
-    if args.rm_cache:
-        remove_cache()
+    if args.profile:
+        profile_main(args)
+        return
+
+    # the daemon replies once the run is over, which would defeat streaming
+    if args.use_daemon and not args.stream:
+        from pycee.server import forward
+
+        exit_code = forward(sys.argv[1:])
+        if exit_code is not None:
+            sys.exit(exit_code)
+
+    from pycee.pipeline import run
+
+    run(args)
+
+
+def profile_main(args):
+    """ Run pycee recording the time spent on each stage.
+    The daemon is left out, so the profile covers the whole run """
+
+    from pycee import profiling
+
+    profiling.enable()
+    try:
+        with profiling.span("pycee", file=args.file_name):
+            from pycee.pipeline import run
+
+            run(args)
+    finally:
+        try:
+            profiling.write(args.profile, profiling.disable())
+        except OSError as error:
+            print(f"Could not write the profile: {error}")
+
+
+def cache_main(args):
+    """ Run one of the 'pycee cache' commands """
+
+    from pycee.cache import export_bundle, import_bundle
+
+    if args.command == "warm":
+        warm_main(args)
+        return
+
+    try:
+        if args.command == "export":
+            count = export_bundle(args.bundle)
+            print(f"Exported {count} cache entries to {args.bundle}")
+        elif args.command == "import":
+            count = import_bundle(args.bundle)
+            print(f"Imported {count} cache entries from {args.bundle}")
+    except (OSError, ValueError) as error:
+        print(f"Could not {args.command} the cache bundle: {error}")
+        sys.exit(-1)
+
+
+def warm_main(args):
+    """ Run the 'pycee cache warm' command """
+
+    from pycee.warm import load_corpus, warm_cache
+
+    if args.jobs < 1:
+        print("The number of jobs must be at least 1")
+        sys.exit(-1)
+
+    try:
+        messages = load_corpus(args.corpus)
+    except OSError as error:
+        print(f"Could not read the corpus: {error}")
+        sys.exit(-1)
+
+    counts = warm_cache(messages, args)
+    print(
+        f"Warmed {counts['queries']} queries for {counts['messages']} error messages:"
+        f" {counts['answered']} answered, {counts['unanswered']} without answers, {counts['failed']} failed"
+    )
+
+
+def index_main(args):
+    """ Run one of the 'pycee index' commands """
+
+    from xml.etree.ElementTree import ParseError
+    from pycee.index import import_dump, index_path
+
+    if args.command == "import":
+        try:
+            n_questions, n_answers = import_dump(args.dump)
+        except (OSError, ParseError) as error:
+            print(f"Could not import the data dump: {error}")
+            sys.exit(-1)
+        print(f"Imported {n_questions} questions and {n_answers} answers into {index_path()}")
+
+
+def batch_main(args):
+    """ Run the 'pycee batch' command """
+
+    from pycee.batch import run_batch
+
+    if args.jobs < 1:
+        print("The number of jobs must be at least 1")
+        sys.exit(-1)
+
+    try:
+        counts = run_batch(args.source, args.output, args)
+    except (OSError, ValueError) as error:
+        print(f"Could not run the batch: {error}")
+        sys.exit(-1)
 
-    error_info = get_error_info(args.file_name)
-    query, pycee_hint, pydoc_answer = handle_error(error_info, args)
-    so_answers, _ = get_answers(query, error_info, args)
-    print_answers(so_answers, pycee_hint, pydoc_answer, args)
+    print(
+        f"Diagnosed {counts['scripts']} scripts, {counts['errors']} with errors"
+        f" ({counts['distinct_errors']} distinct)",
+        file=sys.stderr,
+    )
 
 
 if __name__ == "__main__":